@@ -0,0 +1,299 @@
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+# Additive measures summed per (dimension, period); every other metric of
+# the reports is derived from these sums
+MEASURES = [
+    'Impressions',
+    'App installs',
+    'Mobile app registrations completed',
+    'Purchases',
+    'Unique purchases',
+    'Amount spent (EUR)',
+    'Revenue',
+]
+
+# Label of the grand total rows, of the subtotal rows of a parent and of
+# the rows summing everything outside the top of a ranking
+TOTAL = 'Total'
+SUBTOTAL = '{} total'
+OTHER = 'Other'
+
+# Vectorized labels of a dimension, computed from the distinct values of
+# a finer one
+Labels = t.Callable[[pd.Index], pd.Index]
+
+# Column labels of every time bucket (weeks by their Monday), sorting in
+# time order, and the name of its period-over-period change
+PERIOD_FORMATS = {'D': '%Y-%m-%d', 'W': '%Y-%m-%d', 'M': '%Y-%m',
+                  'Q': '%YQ%q'}
+OVER = {'D': 'DoD', 'W': 'WoW', 'M': 'MoM', 'Q': 'QoQ'}
+
+
+def build_cube(
+    df: pd.DataFrame,
+    dimension: str,
+    period: str = 'Day'
+) -> pd.DataFrame:
+    '''Sum all MEASURES per (dimension, period) in one grouped pass.
+
+    The result is indexed by (dimension, period) with one column per
+    measure; only combinations present in the data are stored. Sums are
+    float64 whatever the (integer or float) storage type of the rows.
+    '''
+    return (df.groupby([dimension, period], observed=True)[MEASURES]
+            .sum()
+            .astype('float64'))
+
+
+def merge_cubes(cubes: t.Iterable[pd.DataFrame]) -> pd.DataFrame:
+    '''Sum partial cubes built from disjoint sets of rows into one'''
+    cubes = list(cubes)
+    if len(cubes) == 1:
+        return cubes[0]
+    return pd.concat(cubes).groupby(level=[0, 1], observed=True).sum()
+
+
+def encode(index: pd.Index, labels: Labels) -> pd.CategoricalIndex:
+    '''Labels of every entry of a cube level, dictionary-encoded: the
+    labels are computed once per distinct value and expanded by code'''
+    codes, uniques = pd.factorize(index)
+    label_codes, label_uniques = pd.factorize(labels(pd.Index(uniques)))
+    return pd.CategoricalIndex(pd.Categorical.from_codes(
+        label_codes[codes], label_uniques))
+
+
+def rollup(cube: pd.DataFrame, labels: Labels, name: str) -> pd.DataFrame:
+    '''Coarser cube: the first index level is mapped through ``labels``
+    and the sums are added up again, without going back to the rows'''
+    coarse = encode(cube.index.get_level_values(0), labels).rename(name)
+    return cube.groupby([coarse, cube.index.get_level_values(1)],
+                        observed=True).sum()
+
+
+def top_labels(cube: pd.DataFrame, n: int, measure: str) -> pd.Index:
+    '''Values of the first level with the ``n`` largest sums of a measure
+    over all periods, found by partial selection (in no given order)'''
+    sums = cube[measure].groupby(level=0, observed=True).sum()
+    if len(sums) <= n:
+        return sums.index
+    return sums.index[np.argpartition(-sums.to_numpy(), n - 1)[:n]]
+
+
+def with_totals(
+    cube: pd.DataFrame,
+    parents: t.Optional[Labels] = None,
+    keep: t.Optional[pd.Index] = None
+) -> pd.DataFrame:
+    '''Cube with a TOTAL row per period and, given the ``parents`` of
+    the first level, a SUBTOTAL row per parent and period.
+
+    Totals are sums of the cube itself, so ratios of the total rows are
+    ratios of the summed measures. Given ``keep``, the other values of
+    the first level are summed into one OTHER row per period; subtotals
+    and totals still include them. The first level becomes categorical in
+    reading order: the children of every parent followed by its subtotal,
+    then OTHER and the grand total last.
+    '''
+    finest = cube.index.get_level_values(0).astype(str)
+    periods = cube.index.get_level_values(1)
+    parts = [(finest, cube)]
+    order = sorted(finest.unique())
+    tail = []
+    if keep is not None:
+        kept = finest.isin(keep.astype(str))
+        other = cube[~kept].groupby(level=1, observed=True).sum()
+        parts = [(finest[kept], cube[kept])]
+        if len(other):
+            parts.append((pd.Index([OTHER] * len(other)), other))
+            tail = [OTHER]
+        order = sorted(finest[kept].unique())
+    if parents is not None:
+        parent = encode(finest, parents)
+        subtotals = cube.groupby([parent, periods], observed=True).sum()
+        parts.append((subtotals.index.get_level_values(0).astype(str)
+                      .map(SUBTOTAL.format), subtotals))
+        parent_of = dict(zip(finest, parent.astype(str)))
+        order = [label
+                 for name in sorted(set(parent_of.values()))
+                 for label in [child for child in order
+                               if parent_of[child] == name]
+                 + [SUBTOTAL.format(name)]]
+    total = cube.groupby(level=1, observed=True).sum()
+    parts.append((pd.Index([TOTAL] * len(total)), total))
+
+    labels = pd.Categorical(
+        [label for part_labels, _ in parts for label in part_labels],
+        categories=order + tail + [TOTAL])
+    frame = pd.concat([part for _, part in parts], ignore_index=True)
+    frame.index = pd.MultiIndex.from_arrays(
+        [labels, [period for _, part in parts
+                  for period in part.index.get_level_values(-1)]],
+        names=cube.index.names)
+    return frame
+
+
+def period_labels(days: pd.Index, period: str) -> pd.Index:
+    '''Labels of the time buckets of day codes (days since the epoch)'''
+    periods = pd.to_datetime(days, unit='D').to_period(period)
+    if period == 'W':
+        periods = periods.start_time
+    return pd.Index(periods.strftime(PERIOD_FORMATS[period]))
+
+
+def rebucket(
+    cube: pd.DataFrame,
+    period: str,
+    name: str = 'Period'
+) -> pd.DataFrame:
+    '''Cube of a day-level cube summed per ``period`` bucket; the labels
+    are computed once per distinct day and ordered in time'''
+    labels = encode(cube.index.get_level_values(1),
+                    lambda days: period_labels(days, period))
+    labels = labels.reorder_categories(sorted(labels.categories))
+    return cube.groupby([cube.index.get_level_values(0),
+                         labels.rename(name)], observed=True).sum()
+
+
+class SparseTable:
+    '''Dimension x period table kept in coordinate (COO) form: the rows
+    and columns, the (row, column) codes and values of the cells that
+    are present and the ``fill`` value of every other cell.
+
+    Memory and compute scale with the (dimension, period) pairs present
+    in the cube rather than with rows x columns; the matrix is built by
+    ``to_dense`` only when the table is rendered.
+    '''
+
+    def __init__(
+        self,
+        rows: pd.Index,
+        columns: pd.Index,
+        row_codes: np.ndarray,
+        column_codes: np.ndarray,
+        data: np.ndarray,
+        fill: float = 0.0
+    ):
+        self.rows = rows
+        self.columns = columns
+        self.row_codes = row_codes
+        self.column_codes = column_codes
+        self.data = data
+        self.fill = fill
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.rows), len(self.columns)
+
+    @property
+    def empty(self) -> bool:
+        return not (len(self.rows) and len(self.columns))
+
+    def to_dense(self) -> pd.DataFrame:
+        '''The table as a rows x columns frame'''
+        values = np.full(self.shape, self.fill, dtype=float)
+        values[self.row_codes, self.column_codes] = self.data
+        return pd.DataFrame(values, index=self.rows, columns=self.columns)
+
+
+def _coordinates(
+    cube: pd.DataFrame
+) -> tuple[pd.Index, pd.Index, np.ndarray, np.ndarray]:
+    '''Rows, columns and the (row, column) codes of every cube entry'''
+    index = cube.index.remove_unused_levels()
+    rows, columns = (level.rename(name) for level, name
+                     in zip(index.levels, index.names))
+    return rows, columns, index.codes[0], index.codes[1]
+
+
+def pivot(cube: pd.DataFrame, measure: str) -> SparseTable:
+    '''Dimension x period table of one measure, missing cells are 0'''
+    return SparseTable(*_coordinates(cube),
+                       cube[measure].to_numpy(dtype=float))
+
+
+class DivisionPolicy:
+    '''How a ratio of sums treats zero denominators: ``zero_division``
+    is the value of x/0 for x != 0 (inf when None), ``undefined`` that of
+    0/0 (NaN when None)'''
+
+    def __init__(
+        self,
+        zero_division: t.Optional[float] = None,
+        undefined: t.Optional[float] = None
+    ):
+        self.zero_division = zero_division
+        self.undefined = undefined
+
+    @property
+    def fill(self) -> float:
+        '''Value of the cells of a ratio table missing from the cube,
+        which are 0/0'''
+        return np.nan if self.undefined is None else self.undefined
+
+    def divide(
+        self,
+        numerators: np.ndarray,
+        denominators: np.ndarray
+    ) -> np.ndarray:
+        '''Element by element numerators / denominators, as whole-array
+        operations'''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = numerators / denominators
+        if self.zero_division is not None:
+            ratio[(denominators == 0) & (numerators != 0)] = (
+                self.zero_division)
+        if self.undefined is not None:
+            ratio[np.isnan(ratio)] = self.undefined
+        return ratio
+
+
+def ratio_pivot(
+    cube: pd.DataFrame,
+    numerator: str,
+    denominator: str,
+    policy: DivisionPolicy,
+    scale: float = 1
+) -> SparseTable:
+    '''Dimension x period table of numerator * scale / denominator, taken
+    on the aggregated sums; cells missing from the cube are 0/0'''
+    return SparseTable(
+        *_coordinates(cube),
+        policy.divide(cube[numerator].to_numpy(dtype=float) * scale,
+                      cube[denominator].to_numpy(dtype=float)),
+        policy.fill)
+
+
+def change_pivot(
+    cube: pd.DataFrame,
+    measure: str,
+    policy: DivisionPolicy
+) -> SparseTable:
+    '''Dimension x period table of the change of a measure against the
+    previous period, as a fraction; the first period is left out.
+
+    Only cells present in the cube and the cells of the period after them
+    can differ from 0/0, so the changes are computed for these alone.
+    '''
+    rows, columns, row_codes, column_codes = _coordinates(cube)
+    width = len(columns)
+    if width < 2:
+        return SparseTable(rows, columns[1:], np.zeros(0, dtype=int),
+                           np.zeros(0, dtype=int), np.zeros(0),
+                           policy.fill)
+    values = cube[measure].to_numpy(dtype=float)
+    # Cells as row * width + column; the value of a cell is the previous
+    # value of the cell to its right
+    cells = row_codes.astype(np.int64) * width + column_codes
+    has_next = column_codes < width - 1
+    keys = np.union1d(cells, cells[has_next] + 1)
+    current = np.zeros(len(keys))
+    current[np.searchsorted(keys, cells)] = values
+    previous = np.zeros(len(keys))
+    previous[np.searchsorted(keys, cells[has_next] + 1)] = values[has_next]
+    change = policy.divide(current - previous, previous)
+    kept = keys % width != 0
+    return SparseTable(rows, columns[1:], keys[kept] // width,
+                       keys[kept] % width - 1, change[kept], policy.fill)
@@ -0,0 +1,339 @@
+import abc
+import os
+import sqlite3
+import typing as t
+
+import pandas as pd
+from gspread.utils import a1_to_rowcol
+
+# Cell values of a worksheet, header first
+Values = list[list[t.Any]]
+
+
+class Source(abc.ABC):
+    '''Where the dataset worksheets are read from.
+
+    ``name`` identifies the source in the local cache, the revision
+    changes whenever any worksheet of it does.
+    '''
+    name = ''
+
+    @abc.abstractmethod
+    def get_revision(self) -> str:
+        ...
+
+    @abc.abstractmethod
+    def get_values(self, worksheet_name: str) -> Values:
+        ...
+
+    def iter_values(
+        self,
+        worksheet_name: str,
+        chunk_rows: int
+    ) -> t.Iterator[Values]:
+        '''Consecutive row ranges of chunk_rows rows, the first chunk
+        starts with the header'''
+        values = self.get_values(worksheet_name)
+        for start in range(0, len(values), chunk_rows):
+            yield values[start:start + chunk_rows]
+
+
+class Sink(abc.ABC):
+    '''Where the report worksheets are written to.
+
+    Values and number formats are queued per worksheet and written by
+    ``flush``; ranges are given in A1 notation and values are written
+    starting at their top left cell.
+    '''
+    name = ''
+
+    def __init__(self):
+        self._pending: dict[str, list[tuple[str, Values]]] = {}
+        self._pending_formats: dict[str, list[dict[str, t.Any]]] = {}
+
+    def buffer_update(
+        self,
+        worksheet_name: str,
+        cells_scope: str,
+        values: Values
+    ) -> None:
+        '''Function to queue info for selected area until flush() is called'''
+        self._pending.setdefault(worksheet_name, []).append(
+            (cells_scope, values))
+
+    def buffer_format(
+        self,
+        worksheet_name: str,
+        cells_scope: str,
+        number_format: dict[str, str]
+    ) -> None:
+        '''Function to queue a numberFormat for selected area. Example:
+        {'type': 'PERCENT', 'pattern': '0.0%'}'''
+        self._pending_formats.setdefault(worksheet_name, []).append(
+            {'range': cells_scope, 'format': {'numberFormat': number_format}})
+
+    def _take_pending(
+        self,
+        worksheet_name: t.Optional[str]
+    ) -> list[tuple[str, list[tuple[str, Values]], list[dict[str, t.Any]]]]:
+        '''Queued (worksheet, updates, formats), removed from the queue'''
+        names = ([worksheet_name] if worksheet_name is not None
+                 else list(dict.fromkeys(
+                     [*self._pending, *self._pending_formats])))
+        return [(name, self._pending.pop(name, []),
+                 self._pending_formats.pop(name, [])) for name in names]
+
+    @abc.abstractmethod
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        ...
+
+
+def _cells(
+    updates: list[tuple[str, Values]]
+) -> t.Iterator[tuple[int, int, t.Any]]:
+    '''(row, column, value) of every queued cell, 1-based'''
+    for cells_scope, values in updates:
+        row, col = a1_to_rowcol(cells_scope.split(':')[0])
+        for row_offset, line in enumerate(values):
+            for col_offset, value in enumerate(line):
+                yield row + row_offset, col + col_offset, value
+
+
+class _FileSource(Source):
+    '''One file per worksheet in a directory; the revision is the newest
+    modification time of the files'''
+    extension = ''
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.name = os.path.abspath(directory)
+
+    def _path(self, worksheet_name: str) -> str:
+        return os.path.join(self.directory,
+                            f'{worksheet_name}.{self.extension}')
+
+    def get_revision(self) -> str:
+        return str(max((entry.stat().st_mtime_ns
+                        for entry in os.scandir(self.directory)
+                        if entry.name.endswith(f'.{self.extension}')),
+                       default=0))
+
+    def get_values(self, worksheet_name: str) -> Values:
+        return _frame_values(self._read(worksheet_name), header=True)
+
+    @abc.abstractmethod
+    def _read(self, worksheet_name: str) -> pd.DataFrame:
+        ...
+
+
+def _frame_values(df: pd.DataFrame, header: bool) -> Values:
+    '''Frame as worksheet values, missing cells blank like in Sheets'''
+    rows = df.astype(object).where(df.notna(), '').values.tolist()
+    return [list(df.columns)] + rows if header else rows
+
+
+class CsvSource(_FileSource):
+    '''Dataset worksheets exported as ``<directory>/<worksheet>.csv``'''
+    extension = 'csv'
+
+    def _read(self, worksheet_name: str) -> pd.DataFrame:
+        # Cells stay text, the dataset schema types them like Sheets values
+        return pd.read_csv(self._path(worksheet_name), dtype=str,
+                           keep_default_na=False)
+
+    def iter_values(
+        self,
+        worksheet_name: str,
+        chunk_rows: int
+    ) -> t.Iterator[Values]:
+        chunks = pd.read_csv(self._path(worksheet_name), dtype=str,
+                             keep_default_na=False, chunksize=chunk_rows)
+        for number, chunk in enumerate(chunks):
+            yield _frame_values(chunk, header=number == 0)
+
+
+class ParquetSource(_FileSource):
+    '''Dataset worksheets stored as ``<directory>/<worksheet>.parquet``'''
+    extension = 'parquet'
+
+    def _read(self, worksheet_name: str) -> pd.DataFrame:
+        return pd.read_parquet(self._path(worksheet_name))
+
+    def iter_values(
+        self,
+        worksheet_name: str,
+        chunk_rows: int
+    ) -> t.Iterator[Values]:
+        from pyarrow import parquet
+
+        file = parquet.ParquetFile(self._path(worksheet_name))
+        for number, batch in enumerate(
+                file.iter_batches(batch_size=chunk_rows)):
+            yield _frame_values(batch.to_pandas(), header=number == 0)
+
+
+def _number(value: t.Any) -> t.Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+class ParquetSink(Sink):
+    '''Report worksheets as ``<directory>/<worksheet>.parquet`` files of
+    (row, column, number, text) cells. Number formats are presentation
+    only and are not stored.
+    '''
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.name = f'parquet:{os.path.abspath(directory)}'
+
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for name, updates, _ in self._take_pending(worksheet_name):
+            path = os.path.join(self.directory, f'{name}.parquet')
+            cells = {}
+            if os.path.exists(path):
+                # Updates of a few ranges keep the rest of the worksheet
+                existing = pd.read_parquet(path)
+                for row, col, number, text in existing.itertuples(
+                        index=False):
+                    cells[row, col] = number if text is None else text
+            cells.update({(row, col): value
+                          for row, col, value in _cells(updates)})
+            frame = pd.DataFrame(
+                [(row, col, _number(value),
+                  None if _number(value) is not None else str(value))
+                 for (row, col), value in sorted(cells.items())],
+                columns=['row', 'column', 'number', 'text'])
+            frame.to_parquet(path, index=False)
+            paths.append(path)
+        return paths
+
+
+class SQLiteSink(Sink):
+    '''Report worksheets as rows of a ``cells`` table (and their number
+    formats in a ``formats`` table) of one SQLite database'''
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.name = f'sqlite:{os.path.abspath(path)}'
+
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        queued = self._take_pending(worksheet_name)
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cells (worksheet TEXT, '
+                '"row" INTEGER, "column" INTEGER, value, '
+                'PRIMARY KEY (worksheet, "row", "column"))')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS formats (worksheet TEXT, '
+                'range TEXT, type TEXT, pattern TEXT, '
+                'PRIMARY KEY (worksheet, range))')
+            for name, updates, formats in queued:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)',
+                    ((name, row, col, value)
+                     for row, col, value in _cells(updates)))
+                connection.executemany(
+                    'INSERT OR REPLACE INTO formats VALUES (?, ?, ?, ?)',
+                    ((name, cell_format['range'],
+                      cell_format['format']['numberFormat']['type'],
+                      cell_format['format']['numberFormat'].get('pattern'))
+                     for cell_format in formats))
+        return [name for name, _, _ in queued]
+
+
+class XlsxSink(Sink):
+    '''Report worksheets as sheets of one Excel workbook, with the number
+    formats applied (requires openpyxl)'''
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.name = f'xlsx:{os.path.abspath(path)}'
+
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        import openpyxl
+
+        queued = self._take_pending(worksheet_name)
+        if not queued:
+            return []
+        if os.path.exists(self.path):
+            workbook = openpyxl.load_workbook(self.path)
+        else:
+            workbook = openpyxl.Workbook()
+            workbook.remove(workbook.active)
+        for name, updates, formats in queued:
+            # Excel limits sheet titles to 31 characters
+            title = name[:31]
+            sheet = (workbook[title] if title in workbook.sheetnames
+                     else workbook.create_sheet(title))
+            for row, col, value in _cells(updates):
+                sheet.cell(row=row, column=col, value=value)
+            for cell_format in formats:
+                pattern = cell_format['format']['numberFormat'].get(
+                    'pattern')
+                if pattern is None:
+                    continue
+                for line in sheet[cell_format['range']]:
+                    for cell in line:
+                        cell.number_format = pattern
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        workbook.save(self.path)
+        return [name for name, _, _ in queued]
+
+
+class DryRunSink(Sink):
+    '''Sink that writes nothing; ``flush`` returns (worksheet, ranges,
+    cells, formats) of what was queued'''
+
+    def __init__(self, name: str = 'dry-run'):
+        super().__init__()
+        self.name = name
+
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        return [(name, len(updates),
+                 sum(1 for _ in _cells(updates)), len(formats))
+                for name, updates, formats
+                in self._take_pending(worksheet_name)]
+
+
+def open_source(spec: str) -> Source:
+    '''Source of a 'sheets', 'sheets:<spreadsheet>', 'csv:<directory>' or
+    'parquet:<directory>' spec'''
+    kind, _, location = spec.partition(':')
+    if kind == 'sheets':
+        from gdrive_processors import GSheet
+
+        return GSheet(location) if location else GSheet()
+    if kind == 'csv':
+        return CsvSource(location)
+    if kind == 'parquet':
+        return ParquetSource(location)
+    raise ValueError(f'Unknown source {spec!r}')
+
+
+def open_sink(spec: str) -> Sink:
+    '''Sink of a 'sheets', 'sheets:<spreadsheet>', 'parquet:<directory>',
+    'xlsx:<path>' or 'sqlite:<path>' spec'''
+    kind, _, location = spec.partition(':')
+    if kind == 'sheets':
+        from gdrive_processors import GSheet
+
+        return GSheet(location) if location else GSheet()
+    if kind == 'parquet':
+        return ParquetSink(location)
+    if kind == 'xlsx':
+        return XlsxSink(location)
+    if kind == 'sqlite':
+        return SQLiteSink(location)
+    raise ValueError(f'Unknown sink {spec!r}')
@@ -0,0 +1,154 @@
+'''Run the reports for many spreadsheets at once.
+
+A manifest lists one tenant per market or ad account:
+
+    {"tenants": [
+        {"name": "de",
+         "spreadsheet": "DE - Ads & Acquisition",
+         "credentials": "keys/de.json",
+         "reports": {"countries": "pivot tables - countries data"}},
+        {"name": "fr",
+         "spreadsheet": "FR - Ads & Acquisition",
+         "reports": ["countries", "campaigns"],
+         "sink": "xlsx:out/fr.xlsx"}
+    ]}
+
+``credentials`` is the path of a service account key, relative to the
+manifest (SERVICE_ACCOUNT by default); ``reports`` names the reports to
+build, optionally with the worksheet to write each one to; ``dataset``
+names the dataset worksheet and ``sink`` replaces the spreadsheet as the
+target.
+'''
+import json
+import os
+import time
+import typing as t
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from backends import open_sink
+from constants import (BATCH_CPU_WORKERS, BATCH_IO_WORKERS, DATASET,
+                       STORE_PATH, TELEMETRY_FILE)
+from dataset import load_dataset
+from gdrive_processors import GSheet
+from incremental import Snapshot
+from reports import (REPORTS, Report, Tables, aggregate_dataset,
+                     build_tables, publish_tables)
+from store import AggregateStore
+from telemetry import TELEMETRY
+
+
+class Tenant:
+    '''One spreadsheet of a manifest and the reports built for it'''
+
+    def __init__(
+        self,
+        name: str,
+        spreadsheet: str,
+        reports: list[Report],
+        credentials: t.Optional[dict[str, str]] = None,
+        dataset: str = DATASET,
+        sink: t.Optional[str] = None
+    ):
+        self.name = name
+        self.spreadsheet = spreadsheet
+        self.reports = reports
+        self.credentials = credentials
+        self.dataset = dataset
+        self.sink = sink
+
+    @classmethod
+    def from_manifest(
+        cls,
+        entry: dict[str, t.Any],
+        directory: str = '.'
+    ) -> 'Tenant':
+        reports = entry.get('reports', list(REPORTS))
+        if not isinstance(reports, dict):
+            reports = {name: None for name in reports}
+        credentials = None
+        if entry.get('credentials'):
+            with open(os.path.join(directory, entry['credentials'])) as file:
+                credentials = json.load(file)
+        return cls(
+            entry['name'], entry['spreadsheet'],
+            [REPORTS[name] if worksheet_name is None
+             else REPORTS[name].on_worksheet(worksheet_name)
+             for name, worksheet_name in reports.items()],
+            credentials=credentials,
+            dataset=entry.get('dataset', DATASET),
+            sink=entry.get('sink'))
+
+
+def load_manifest(path: str) -> list[Tenant]:
+    '''Tenants of a manifest file'''
+    with open(path) as file:
+        manifest = json.load(file)
+    directory = os.path.dirname(os.path.abspath(path))
+    tenants = [Tenant.from_manifest(entry, directory)
+               for entry in manifest['tenants']]
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError('Tenant names of a manifest must be unique')
+    return tenants
+
+
+def _compute(
+    df: pd.DataFrame,
+    snapshot_name: str,
+    reports: list[Report]
+) -> tuple[pd.Series, pd.DataFrame, dict[str, Tables]]:
+    '''CPU-bound part of a tenant, run in a worker process'''
+    hashes, cube = aggregate_dataset(df, Snapshot(snapshot_name))
+    return hashes, cube, build_tables(reports, cube)
+
+
+def _run_tenant(
+    tenant: Tenant,
+    processes: ProcessPoolExecutor
+) -> dict[str, t.Any]:
+    started = time.perf_counter()
+    try:
+        source = GSheet(tenant.spreadsheet, tenant.credentials)
+        sink = open_sink(tenant.sink) if tenant.sink else source
+        snapshot = Snapshot(tenant.name)
+        with TELEMETRY.stage('load'):
+            df = load_dataset(source, tenant.dataset)
+        hashes, cube, tables = processes.submit(
+            _compute, df, tenant.name, tenant.reports).result()
+        layouts, _ = publish_tables(sink, snapshot, tables)
+        snapshot.save(hashes, cube, layouts)
+        if STORE_PATH is not None:
+            AggregateStore(STORE_PATH).append(cube, source.name)
+    except Exception as error:
+        TELEMETRY.count('batch_tenants', status='failed')
+        return {'tenant': tenant.name, 'ok': False,
+                'seconds': time.perf_counter() - started,
+                'error': f'{type(error).__name__}: {error}'}
+    TELEMETRY.count('batch_tenants', status='ok')
+    return {'tenant': tenant.name, 'ok': True,
+            'seconds': time.perf_counter() - started,
+            'worksheets': sorted(tables)}
+
+
+def run_batch(
+    tenants: list[Tenant],
+    cpu_workers: t.Optional[int] = BATCH_CPU_WORKERS,
+    io_workers: int = BATCH_IO_WORKERS
+) -> list[dict[str, t.Any]]:
+    '''Build and publish the reports of every tenant; one result per
+    tenant, in manifest order, whether it succeeded or failed.
+
+    Tenants are driven by ``io_workers`` threads sharing the Sheets quota
+    limiter of GSheet; aggregation and table building of every tenant run
+    in a pool of ``cpu_workers`` processes.
+    '''
+    TELEMETRY.reset()
+    with ProcessPoolExecutor(cpu_workers) as processes, \
+            ThreadPoolExecutor(io_workers) as threads:
+        futures = [threads.submit(_run_tenant, tenant, processes)
+                   for tenant in tenants]
+        results = [future.result() for future in futures]
+    TELEMETRY.write(TELEMETRY_FILE)
+    return results
@@ -0,0 +1,153 @@
+import collections
+import json
+import threading
+import typing as t
+
+from gspread.utils import a1_to_rowcol
+
+
+class ApiStats:
+    '''Requests made against the fake backend and the JSON bytes they
+    would have moved over the wire'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(
+        self,
+        method: str,
+        sent: t.Any = None,
+        received: t.Any = None
+    ) -> None:
+        sent_bytes = len(json.dumps(sent, default=str)) if sent else 0
+        received_bytes = (len(json.dumps(received, default=str))
+                          if received else 0)
+        with self._lock:
+            self.calls[method] += 1
+            self.bytes_sent += sent_bytes
+            self.bytes_received += received_bytes
+
+    def snapshot(self) -> dict[str, t.Any]:
+        with self._lock:
+            return {'calls': dict(self.calls),
+                    'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent = self.bytes_received = 0
+
+
+class FakeWorksheet:
+    '''In-memory stand-in for gspread.Worksheet holding a grid of values'''
+
+    def __init__(
+        self,
+        title: str,
+        values: list[list[t.Any]],
+        stats: ApiStats
+    ):
+        self.title = title
+        self.values = values
+        self.formats: list[dict[str, t.Any]] = []
+        self.stats = stats
+        # Grid size as of the last Spreadsheet.worksheet() call, like the
+        # properties of a gspread handle
+        self.row_count = len(values)
+
+    def get_values(
+        self,
+        range_name: t.Optional[str] = None,
+        **kwargs: t.Any
+    ) -> list[list[t.Any]]:
+        values = self.values
+        if range_name is not None:
+            # Only the row ranges ('1:50000') GSheet.iter_values asks for
+            first, last = map(int, range_name.split(':'))
+            values = values[first - 1:last]
+        values = [list(row) for row in values]
+        self.stats.record('get_values', received=values)
+        return values
+
+    def get_all_records(self) -> list[dict[str, t.Any]]:
+        header, rows = self.values[0], self.values[1:]
+        records = [dict(zip(header, row)) for row in rows]
+        self.stats.record('get_all_records', received=records)
+        return records
+
+    def update(self, range_name: str, values: list[list[t.Any]]) -> None:
+        self.stats.record('update', sent=values)
+        self.write(range_name, values)
+
+    def batch_format(self, formats: list[dict[str, t.Any]]) -> None:
+        self.stats.record('batch_format', sent=formats)
+        self.formats.extend(formats)
+
+    def write(self, range_name: str, values: list[list[t.Any]]) -> None:
+        '''Store values starting at the top left cell of the range'''
+        row, col = a1_to_rowcol(range_name.split('!')[-1].split(':')[0])
+        for offset, line in enumerate(values):
+            while len(self.values) < row + offset:
+                self.values.append([])
+            target = self.values[row + offset - 1]
+            if len(target) < col - 1 + len(line):
+                target.extend([''] * (col - 1 + len(line) - len(target)))
+            target[col - 1:col - 1 + len(line)] = line
+
+
+class FakeSpreadsheet:
+    '''In-memory stand-in for gspread.Spreadsheet'''
+
+    def __init__(
+        self,
+        worksheets: dict[str, list[list[t.Any]]],
+        stats: ApiStats,
+        revision: str = '2024-01-01T00:00:00.000Z'
+    ):
+        self.stats = stats
+        self.revision = revision
+        self.worksheets = {title: FakeWorksheet(title, values, stats)
+                           for title, values in worksheets.items()}
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.stats.record('worksheet')
+        worksheet = self._worksheet(title)
+        worksheet.row_count = len(worksheet.values)
+        return worksheet
+
+    def _worksheet(self, title: str) -> FakeWorksheet:
+        if title not in self.worksheets:
+            # Report worksheets start out empty
+            self.worksheets[title] = FakeWorksheet(title, [], self.stats)
+        return self.worksheets[title]
+
+    def get_lastUpdateTime(self) -> str:
+        self.stats.record('get_lastUpdateTime')
+        return self.revision
+
+    def values_batch_update(self, body: dict[str, t.Any]) -> None:
+        self.stats.record('values_batch_update', sent=body)
+        for data in body['data']:
+            title = data['range'].split('!')[0].strip("'")
+            self._worksheet(title).write(data['range'], data['values'])
+
+
+class FakeClient:
+    '''In-memory stand-in for gspread.Client serving one spreadsheet
+    whatever name is opened'''
+
+    def __init__(
+        self,
+        worksheets: dict[str, list[list[t.Any]]],
+        revision: str = '2024-01-01T00:00:00.000Z'
+    ):
+        self.stats = ApiStats()
+        self.spreadsheet = FakeSpreadsheet(worksheets, self.stats, revision)
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        self.stats.record('open')
+        return self.spreadsheet
@@ -0,0 +1,180 @@
+'''Offline benchmark of the report pipeline.
+
+Runs every stage of both reports against a synthetic dataset served by
+an in-memory Sheets backend and reports time, peak memory and the API
+requests of every stage:
+
+    python -m benchmarks.run --campaigns 50 --countries 12 --months 24
+    python -m benchmarks.run --json results.json
+    python -m benchmarks.run --baseline results.json
+
+With --baseline the run fails when a stage got slower than the baseline
+by more than --tolerance or sends more requests or bytes than it did.
+'''
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import typing as t
+
+from benchmarks.fake_sheets import FakeClient
+from benchmarks.synthetic import generate_values
+
+STAGES = ['load', 'clean', 'aggregate', 'format', 'publish']
+
+
+def _pipeline(client: FakeClient) -> t.Iterator[tuple[str, t.Callable]]:
+    '''Stages of a full, uncached run of both reports; each yielded
+    callable runs one stage on the results of the previous ones'''
+    from aggregation import build_cube, rebucket, rollup
+    from constants import DATASET, PERIOD
+    from dataset import typed_dataset
+    from gdrive_processors import GSheet
+    from layout import write_tables
+    from reports import (CAMPAIGNS, COUNTRIES, DIMENSIONS,
+                         FINEST_DIMENSION)
+
+    state: dict[str, t.Any] = {}
+
+    def load() -> None:
+        # A new session, so opening the spreadsheet is part of the stage
+        GSheet.use_client(client)
+        state['gsheet'] = GSheet()
+        state['values'] = state['gsheet'].get_values(DATASET)
+
+    def clean() -> None:
+        state['df'] = typed_dataset(state['values'])
+
+    def aggregate() -> None:
+        cube = rebucket(build_cube(state['df'], FINEST_DIMENSION), PERIOD)
+        state['cubes'] = {
+            report.dimension: (cube if report.dimension == FINEST_DIMENSION
+                               else rollup(cube, DIMENSIONS[report.dimension],
+                                           report.dimension))
+            for report in (COUNTRIES, CAMPAIGNS)}
+
+    def format_() -> None:
+        for report in (COUNTRIES, CAMPAIGNS):
+            write_tables(state['gsheet'], report.worksheet_name,
+                         report.tables(state['cubes'][report.dimension]))
+
+    def publish() -> None:
+        state['gsheet'].flush()
+
+    yield from zip(STAGES, [load, clean, aggregate, format_, publish])
+
+
+def run_benchmark(
+    campaigns: int,
+    countries: int,
+    months: int,
+    rows_per_month: int = 4,
+    repeat: int = 5,
+    seed: int = 0
+) -> dict[str, t.Any]:
+    '''Time every stage over ``repeat`` runs, then measure peak memory
+    and API traffic in one more run under tracemalloc'''
+    from constants import DATASET
+
+    values = generate_values(campaigns, countries, months, rows_per_month,
+                             seed=seed)
+    client = FakeClient({DATASET: values})
+    times: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        for stage, function in _pipeline(client):
+            started = time.perf_counter()
+            function()
+            times[stage].append(time.perf_counter() - started)
+
+    stages = {}
+    for stage, function in _pipeline(client):
+        client.stats.reset()
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stages[stage] = {
+            'seconds_min': min(times[stage]),
+            'seconds_median': statistics.median(times[stage]),
+            'peak_bytes': peak,
+            **client.stats.snapshot(),
+        }
+    return {'rows': len(values) - 1, 'repeat': repeat, 'stages': stages}
+
+
+def compare(
+    result: dict[str, t.Any],
+    baseline: dict[str, t.Any],
+    tolerance: float
+) -> list[str]:
+    '''Regressions of a result against a baseline of the same size'''
+    regressions = []
+    for stage, measured in result['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None:
+            continue
+        if measured['seconds_min'] > before['seconds_min'] * (1 + tolerance):
+            regressions.append(
+                f"{stage}: {measured['seconds_min']:.4f}s, baseline "
+                f"{before['seconds_min']:.4f}s")
+        calls, calls_before = (sum(measured['calls'].values()),
+                               sum(before['calls'].values()))
+        if calls > calls_before:
+            regressions.append(
+                f'{stage}: {calls} API calls, baseline {calls_before}')
+        if measured['bytes_sent'] > before['bytes_sent']:
+            regressions.append(
+                f"{stage}: {measured['bytes_sent']} bytes sent, baseline "
+                f"{before['bytes_sent']}")
+    return regressions
+
+
+def _print_result(result: dict[str, t.Any]) -> None:
+    print(f"{result['rows']} rows, best and median of {result['repeat']}")
+    print(f"{'stage':<10}{'min s':>10}{'median s':>10}{'peak MiB':>10}"
+          f"{'calls':>7}{'sent KiB':>10}{'recv KiB':>10}")
+    for stage, measured in result['stages'].items():
+        print(f"{stage:<10}{measured['seconds_min']:>10.4f}"
+              f"{measured['seconds_median']:>10.4f}"
+              f"{measured['peak_bytes'] / 2 ** 20:>10.1f}"
+              f"{sum(measured['calls'].values()):>7}"
+              f"{measured['bytes_sent'] / 2 ** 10:>10.1f}"
+              f"{measured['bytes_received'] / 2 ** 10:>10.1f}")
+
+
+def main(argv: t.Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the report pipeline against a synthetic '
+                    'dataset and an in-memory Sheets backend')
+    parser.add_argument('--campaigns', type=int, default=20)
+    parser.add_argument('--countries', type=int, default=8)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--rows-per-month', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline',
+                        help='results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.campaigns, args.countries, args.months,
+                           args.rows_per_month, args.repeat, args.seed)
+    _print_result(result)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import datetime
+import random
+import typing as t
+
+from dataset import DATASET_SCHEMA
+
+COUNTRIES = ['Germany', 'France', 'Spain', 'Italy', 'Poland', 'Netherlands',
+             'Austria', 'Belgium', 'Sweden', 'Portugal', 'Czechia',
+             'Denmark', 'Finland', 'Ireland', 'Greece', 'Hungary']
+PLATFORMS = ['ios', 'android']
+
+# Share of blank cells in the sparsely filled count columns
+BLANK_RATIOS = {'App installs': 0.3, 'Purchases': 0.4}
+
+
+def _month_starts(first: datetime.date, months: int) -> list[datetime.date]:
+    starts = []
+    year, month = first.year, first.month
+    for _ in range(months):
+        starts.append(datetime.date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return starts
+
+
+def generate_values(
+    campaigns: int = 20,
+    countries: int = 8,
+    months: int = 12,
+    rows_per_month: int = 4,
+    first_month: datetime.date = datetime.date(2022, 1, 1),
+    seed: int = 0
+) -> list[list[t.Any]]:
+    '''Raw values of a synthetic dataset worksheet, header first, the way
+    GSheet.get_values returns them: unformatted numbers, dates as strings
+    and blank cells as ''.
+
+    Every campaign runs in every country and month, reported in
+    ``rows_per_month`` periods; App installs and Purchases are left blank
+    in BLANK_RATIOS of the rows.
+    '''
+    generator = random.Random(seed)
+    header = list(DATASET_SCHEMA)
+    country_names = [COUNTRIES[position] if position < len(COUNTRIES)
+                     else f'Country {position}'
+                     for position in range(countries)]
+    names = [f'{country}, campaign {number}, '
+             f'{PLATFORMS[number % len(PLATFORMS)]}'
+             for country in country_names
+             for number in range(campaigns)]
+    values: list[list[t.Any]] = [header]
+    for start in _month_starts(first_month, months):
+        for name in names:
+            for period in range(rows_per_month):
+                starts = start + datetime.timedelta(days=7 * period)
+                ends = starts + datetime.timedelta(days=6)
+                impressions = generator.randint(1_000, 200_000)
+                installs = int(impressions * generator.uniform(0, 0.02))
+                registrations = int(installs * generator.uniform(0.1, 0.6))
+                purchases = int(registrations * generator.uniform(0, 0.5))
+                row = {
+                    'Campaign name': name,
+                    'Reporting starts': starts.isoformat(),
+                    'Reporting ends': ends.isoformat(),
+                    'Impressions': impressions,
+                    'App installs': installs,
+                    'Mobile app registrations completed': registrations,
+                    'Purchases': purchases,
+                    'Unique purchases': int(purchases * 0.9),
+                    'Amount spent (EUR)': round(
+                        impressions * generator.uniform(0.001, 0.01), 2),
+                    'Revenue per purchase (EUR)': round(
+                        generator.uniform(5, 60), 2),
+                }
+                for column, ratio in BLANK_RATIOS.items():
+                    if generator.random() < ratio:
+                        row[column] = ''
+                values.append([row[column] for column in header])
+    return values
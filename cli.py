@@ -0,0 +1,286 @@
+'''Command line entry point of the reports.
+
+    python cli.py all
+    python cli.py countries --tables CPM,"Change MoM" --months 2023-03:2023-05
+    python cli.py campaigns --sink xlsx:reports.xlsx --dry-run
+    python cli.py all --watch --interval 60 --debounce 30
+    python cli.py batch tenants.json
+    python cli.py query "CPO (EUR)" --months 2023-01:2023-06
+    python cli.py query "Purchases, #" --dimension Country --restated-since 3
+
+pandas, gspread and the report modules are only imported once a command
+runs, so --help answers at once.
+'''
+import argparse
+import logging
+import re
+import sys
+import typing as t
+
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q'}
+
+COMMANDS = {
+    'countries': ['countries'],
+    'campaigns': ['campaigns'],
+    'all': ['countries', 'campaigns'],
+}
+
+
+def parse_months(text: str) -> list[str]:
+    '''Months of a comma separated list of YYYY-MM months and FROM:TO
+    ranges (both ends included)'''
+    months = []
+    for part in text.split(','):
+        bounds = part.strip().split(':')
+        if len(bounds) > 2 or not all(
+                re.fullmatch(r'\d{4}-\d{2}', bound) for bound in bounds):
+            raise argparse.ArgumentTypeError(
+                f'{part!r} is not a YYYY-MM month or FROM:TO range')
+        first, last = bounds[0], bounds[-1]
+        year, month = map(int, first.split('-'))
+        while f'{year:04d}-{month:02d}' <= last:
+            months.append(f'{year:04d}-{month:02d}')
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return sorted(set(months))
+
+
+def positive_int(text: str) -> int:
+    '''Integer of at least 1'''
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'{text!r} is not at least 1')
+    return value
+
+
+def parse_args(argv: t.Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Build the pivot table reports of the campaign dataset '
+                    'and publish them')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log the progress of the run')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, reports in COMMANDS.items():
+        subparser = commands.add_parser(
+            command, help=f"the {' and '.join(reports)} report"
+                          f"{'s' if len(reports) > 1 else ''}")
+        subparser.add_argument(
+            '--tables', type=lambda text: text.split(','),
+            help='comma separated parts of the titles of the tables to '
+                 'build, e.g. CPM,"Change MoM" (all by default)')
+        subparser.add_argument(
+            '--months', type=parse_months,
+            help='comma separated YYYY-MM months or FROM:TO ranges to '
+                 'write (all by default)')
+        subparser.add_argument(
+            '--period', choices=PERIODS,
+            help='time bucket of the table columns (PERIOD by default)')
+        subparser.add_argument(
+            '--source', help="dataset source spec, e.g. 'sheets' or "
+                             "'parquet:<directory>' (SOURCE by default)")
+        subparser.add_argument(
+            '--sink', help="report sink spec, e.g. 'sheets' or "
+                           "'xlsx:<path>' (SINK by default)")
+        subparser.add_argument(
+            '--worksheet',
+            help='worksheet to write the report to, e.g. for a selection '
+                 'of --tables or --months next to the full report')
+        subparser.add_argument(
+            '--refresh', action='store_true',
+            help='fetch the dataset even if the local cache is recent')
+        subparser.add_argument(
+            '--dry-run', action='store_true',
+            help='build the tables and show what would be written '
+                 'without writing it')
+        subparser.add_argument(
+            '--top', type=positive_int,
+            help="rows kept per table, the rest summed into an 'Other' "
+                 "row (TOP_CAMPAIGNS for campaigns, all by default)")
+        subparser.add_argument(
+            '--rank-by',
+            help='measure the --top rows are ranked by (TOP_MEASURE by '
+                 'default)')
+        subparser.add_argument(
+            '--watch', action='store_true',
+            help='keep running and publish again whenever the source '
+                 'changes')
+        subparser.add_argument(
+            '--interval', type=float,
+            help='seconds between two checks of the source in watch mode '
+                 '(WATCH_INTERVAL_SECONDS by default)')
+        subparser.add_argument(
+            '--debounce', type=float,
+            help='seconds the source has to stay unchanged before a '
+                 'refresh (WATCH_DEBOUNCE_SECONDS by default)')
+    batch = commands.add_parser(
+        'batch', help='the reports of every tenant of a manifest')
+    batch.add_argument('manifest', help='JSON manifest of the tenants')
+    batch.add_argument('--cpu-workers', type=int,
+                       help='aggregating processes (BATCH_CPU_WORKERS by '
+                            'default)')
+    batch.add_argument('--io-workers', type=int,
+                       help='publishing threads (BATCH_IO_WORKERS by '
+                            'default)')
+    query = commands.add_parser(
+        'query', help='a table of the stored history of the aggregates, '
+                      'without reading the dataset')
+    query.add_argument(
+        'metric', nargs='?',
+        help="title of a report table, e.g. 'CPO (EUR)'; lists the stored "
+             "snapshots when omitted")
+    query.add_argument('--dimension',
+                       help="e.g. 'Country' (campaigns by default)")
+    query.add_argument('--period', choices=PERIODS,
+                       help='time bucket of the columns (PERIOD by default)')
+    query.add_argument('--months', type=parse_months,
+                       help='YYYY-MM months or FROM:TO ranges spanning the '
+                            'columns (all by default)')
+    query.add_argument('--source',
+                       help='name of the source whose snapshots to read, '
+                            'as listed without a metric (any by default)')
+    query.add_argument('--snapshot', type=int,
+                       help='id of the snapshot to read (the latest by '
+                            'default)')
+    query.add_argument('--totals', action='store_true',
+                       help='add the total row')
+    query.add_argument('--restated-since', type=int, metavar='SNAPSHOT',
+                       help='show the cells that changed since this '
+                            'snapshot instead')
+    return parser.parse_args(argv)
+
+
+def run_batch_command(args: argparse.Namespace) -> int:
+    from batch import load_manifest, run_batch
+    from constants import BATCH_CPU_WORKERS, BATCH_IO_WORKERS
+
+    results = run_batch(
+        load_manifest(args.manifest),
+        cpu_workers=(args.cpu_workers if args.cpu_workers is not None
+                     else BATCH_CPU_WORKERS),
+        io_workers=(args.io_workers if args.io_workers is not None
+                    else BATCH_IO_WORKERS))
+    for result in results:
+        if result['ok']:
+            print(f"ok      {result['tenant']} ({result['seconds']:.1f}s): "
+                  f"{', '.join(result['worksheets'])}")
+        else:
+            print(f"FAILED  {result['tenant']} ({result['seconds']:.1f}s): "
+                  f"{result['error']}")
+    failed = sum(not result['ok'] for result in results)
+    print(f'{len(results) - failed} of {len(results)} tenants published')
+    return 1 if failed else 0
+
+
+def run_query_command(args: argparse.Namespace) -> int:
+    from constants import PERIOD, STORE_PATH
+    from store import AggregateStore
+
+    store = AggregateStore(STORE_PATH)
+    if args.metric is None:
+        print(store.snapshots(args.source).to_string())
+        return 0
+    options = {
+        'source': args.source,
+        'dimension': args.dimension,
+        'period': PERIODS[args.period] if args.period else PERIOD,
+        'start': min(args.months) if args.months else None,
+        'end': max(args.months) if args.months else None,
+    }
+    try:
+        if args.restated_since is not None:
+            table = store.restated(args.metric, before=args.restated_since,
+                                   after=args.snapshot, **options)
+        else:
+            table = store.table(args.metric, snapshot=args.snapshot,
+                                totals=args.totals, **options)
+    except LookupError as error:
+        print(error.args[0], file=sys.stderr)
+        return 2
+    print(table.to_string())
+    return 0
+
+
+def run_watch_command(args: argparse.Namespace, reports: list) -> int:
+    from backends import open_sink, open_source
+    from constants import (PERIOD, SINK, SOURCE, WATCH_DEBOUNCE_SECONDS,
+                           WATCH_INTERVAL_SECONDS)
+    from watch import Watcher
+
+    if args.dry_run:
+        print('--watch publishes every refresh, it cannot be a dry run',
+              file=sys.stderr)
+        return 2
+    watcher = Watcher(
+        reports, open_source(args.source or SOURCE),
+        open_sink(args.sink or SINK), months=args.months,
+        period=PERIODS[args.period] if args.period else PERIOD,
+        interval=(args.interval if args.interval is not None
+                  else WATCH_INTERVAL_SECONDS),
+        debounce=(args.debounce if args.debounce is not None
+                  else WATCH_DEBOUNCE_SECONDS))
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv: t.Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose
+                        else logging.WARNING)
+    if args.command == 'batch':
+        return run_batch_command(args)
+    if args.command == 'query':
+        return run_query_command(args)
+
+    from aggregation import MEASURES
+    from backends import open_sink, open_source
+    from constants import PERIOD
+    from layout import LayoutChanged
+    from reports import REPORTS, run_reports
+
+    reports = [REPORTS[name] for name in COMMANDS[args.command]]
+    if args.tables:
+        period = PERIODS[args.period] if args.period else PERIOD
+        reports = [report.select(args.tables, period)
+                   for report in reports]
+        if not any(report.selected for report in reports):
+            print(f'No table title contains any of {args.tables}',
+                  file=sys.stderr)
+            return 2
+        reports = [report for report in reports if report.selected]
+    if args.worksheet is not None:
+        if len(reports) > 1:
+            print('--worksheet takes a single report', file=sys.stderr)
+            return 2
+        reports = [reports[0].on_worksheet(args.worksheet)]
+    if args.rank_by is not None and args.rank_by not in MEASURES:
+        print(f'--rank-by is one of {", ".join(MEASURES)}', file=sys.stderr)
+        return 2
+    if args.top is not None or args.rank_by is not None:
+        reports = [report.ranked(
+            args.top if args.top is not None else report.top,
+            args.rank_by or report.rank_by) for report in reports]
+    if args.watch:
+        return run_watch_command(args, reports)
+    try:
+        published = run_reports(
+            reports,
+            source=open_source(args.source) if args.source else None,
+            sink=open_sink(args.sink) if args.sink else None,
+            months=args.months,
+            dry_run=args.dry_run,
+            refresh=args.refresh,
+            **({'period': PERIODS[args.period]} if args.period else {}))
+    except LayoutChanged as error:
+        print(error, file=sys.stderr)
+        return 2
+    if args.dry_run:
+        for worksheet_name, ranges, cells, formats in published:
+            print(f'{worksheet_name}: {cells} cells in {ranges} ranges, '
+                  f'{formats} number formats')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -41,4 +41,67 @@ SERVICE_ACCOUNT = {
   "universe_domain": "googleapis.com"
 }
 
+# Spreadsheet with the dataset and the report worksheets
+SPREADSHEET_NAME = "Copy MarTech Manager - Ads & Acquisition HW - dataset"
+
 DATASET = "dataset"
+
+# Local directory with the state of the previous report runs
+SNAPSHOT_DIR = ".snapshots"
+
+# Local cache of the source worksheets and the time (in seconds) an entry
+# is trusted without checking the spreadsheet revision
+CACHE_DIR = ".cache"
+CACHE_TTL_SECONDS = 15 * 60
+
+# Rows per page when the dataset is read in chunks; None reads it in one
+# response through the local cache
+DATASET_CHUNK_ROWS = None
+
+# Sheets API requests allowed per minute (per user quota) and the number
+# of requests sent concurrently
+SHEETS_REQUESTS_PER_MINUTE = 60
+SHEETS_MAX_WORKERS = 4
+
+# Summary of the stages and Sheets traffic of every report run (JSON, or
+# OpenMetrics for a .prom path), and the profiler ('cprofile' or
+# 'pyinstrument', None to disable) run over the compute stages
+TELEMETRY_FILE = ".telemetry/report.json"
+PROFILER = None
+PROFILE_DIR = ".profiles"
+
+# Where the dataset is read from and the reports are written to: 'sheets',
+# or a local backend such as 'parquet:<directory>' or 'xlsx:<path>' (see
+# backends.open_source and backends.open_sink)
+SOURCE = "sheets"
+SINK = "sheets"
+
+# Worker processes aggregating (None for one per CPU) and threads
+# publishing the tenants of a batch run (see batch.py)
+BATCH_CPU_WORKERS = None
+BATCH_IO_WORKERS = 8
+
+# Time bucket of the report columns: 'D' (day), 'W' (week), 'M' (month) or
+# 'Q' (quarter) of 'Reporting ends'
+PERIOD = "M"
+
+# Value of every ratio and period over period change with a zero
+# denominator, x/0 (x != 0) and 0/0 (also cells without rows); None
+# leaves them inf and NaN, written as blank cells
+ZERO_DIVISION = None
+UNDEFINED_RATIO = None
+
+# Local SQLite history of the aggregates of every report run, queried by
+# store.AggregateStore and 'cli.py query'; None keeps no history
+STORE_PATH = ".history/aggregates.sqlite"
+
+# Watch mode: seconds between two checks of the source revision, and how
+# long a new revision has to stay unchanged before the reports are built
+WATCH_INTERVAL_SECONDS = 60
+WATCH_DEBOUNCE_SECONDS = 30
+
+# Rows kept in every table of the campaigns report: the TOP_CAMPAIGNS
+# campaigns with the largest sum of TOP_MEASURE over the written periods,
+# the others summed into one 'Other' row (None keeps every campaign)
+TOP_CAMPAIGNS = None
+TOP_MEASURE = "Amount spent (EUR)"
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import time
+import typing as t
+
+import pandas as pd
+from pyarrow import feather
+
+from constants import CACHE_DIR, CACHE_TTL_SECONDS
+
+
+class DatasetCache:
+    '''On-disk Feather copies of source worksheets.
+
+    Entries are keyed by spreadsheet and worksheet name and remember the
+    revision (Drive ``modifiedTime``) they were fetched at. An entry
+    younger than ``ttl`` seconds is used without asking for the revision;
+    an older one is used only while the revision did not change.
+    '''
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        ttl: float = CACHE_TTL_SECONDS
+    ):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _paths(
+        self,
+        spreadsheet_name: str,
+        worksheet_name: str
+    ) -> tuple[str, str]:
+        key = hashlib.sha1(
+            f'{spreadsheet_name}\n{worksheet_name}'.encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f'{base}.feather', f'{base}.json'
+
+    def _read_meta(self, meta_path: str) -> t.Optional[dict[str, t.Any]]:
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as meta_file:
+            return json.load(meta_file)
+
+    def get(
+        self,
+        spreadsheet_name: str,
+        worksheet_name: str,
+        get_revision: t.Callable[[], str]
+    ) -> t.Optional[pd.DataFrame]:
+        '''Cached frame of the worksheet or None when it has to be fetched.
+        ``get_revision`` is only called once the entry outlived the TTL'''
+        data_path, meta_path = self._paths(spreadsheet_name, worksheet_name)
+        meta = self._read_meta(meta_path)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        if time.time() - meta['fetched_at'] > self.ttl:
+            if get_revision() != meta['revision']:
+                return None
+            # Same revision: the entry is fresh for another TTL
+            meta['fetched_at'] = time.time()
+            with open(meta_path, 'w') as meta_file:
+                json.dump(meta, meta_file)
+        # Memory-mapped read: the file is not copied into an Arrow buffer,
+        # only once into the pandas columns
+        return feather.read_table(data_path, memory_map=True).to_pandas()
+
+    def put(
+        self,
+        spreadsheet_name: str,
+        worksheet_name: str,
+        revision: str,
+        df: pd.DataFrame
+    ) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(spreadsheet_name, worksheet_name)
+        # Uncompressed, so that reads can be memory-mapped
+        feather.write_feather(df.reset_index(drop=True), data_path,
+                              compression='uncompressed')
+        with open(meta_path, 'w') as meta_file:
+            json.dump({'spreadsheet': spreadsheet_name,
+                       'worksheet': worksheet_name,
+                       'revision': revision,
+                       'fetched_at': time.time()}, meta_file)
+
+    def invalidate(
+        self,
+        spreadsheet_name: t.Optional[str] = None,
+        worksheet_name: t.Optional[str] = None
+    ) -> None:
+        '''Drop the entries of the given spreadsheet and/or worksheet; all
+        entries without arguments'''
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            meta = self._read_meta(os.path.join(self.directory, name))
+            if spreadsheet_name not in (None, meta['spreadsheet']):
+                continue
+            if worksheet_name not in (None, meta['worksheet']):
+                continue
+            for path in self._paths(meta['spreadsheet'], meta['worksheet']):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,52 @@
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+
+class CellFormat:
+    '''How a numeric table is rendered to the sheet.
+
+    Values are sent as raw numbers and displayed through the Sheets
+    ``numberFormat`` of the block, so no cell is formatted in Python.
+    Every block has a pattern: a block without one would keep the format
+    of whatever block sat on its cells before the layout moved.
+    NaN and inf (which have no JSON encoding) are replaced by
+    ``placeholder`` in one vectorized pass.
+    '''
+
+    def __init__(
+        self,
+        pattern: str,
+        number_type: str = 'NUMBER',
+        placeholder: t.Any = ''
+    ):
+        self.pattern = pattern
+        self.number_type = number_type
+        self.placeholder = placeholder
+
+    @property
+    def number_format(self) -> dict[str, str]:
+        '''Sheets numberFormat of the block'''
+        return {'type': self.number_type, 'pattern': self.pattern}
+
+    def render(self, table: pd.DataFrame) -> pd.DataFrame:
+        '''Table of raw cell values ready to be written'''
+        values = table.to_numpy(dtype=float)
+        cells = values.astype(object)
+        cells[~np.isfinite(values)] = self.placeholder
+        return pd.DataFrame(cells, index=table.index, columns=table.columns)
+
+
+# Amounts with two decimals
+DECIMAL = CellFormat('0.00')
+
+# Counts and amounts with a thousands separator
+NUMBER = CellFormat('#,##0.0')
+
+# Amounts with two decimals, thousands separated above one million
+AMOUNT = CellFormat('[>1000000]#,##0.0;0.00')
+
+# Period over period changes and conversion rates, stored as fractions
+CHANGE = CellFormat('0.0%', 'PERCENT')
+RATE = CellFormat('0.00%', 'PERCENT')
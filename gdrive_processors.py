@@ -1,21 +1,148 @@
+import json
+import threading
 import typing as t
 
 import gspread
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
 
-from constants import SERVICE_ACCOUNT
+from backends import Sink, Source
+from constants import (SERVICE_ACCOUNT, SHEETS_MAX_WORKERS,
+                       SHEETS_REQUESTS_PER_MINUTE, SPREADSHEET_NAME)
+from sheets_io import TokenBucket, call_with_retry, run_concurrently
+from telemetry import TELEMETRY
 
+# Upper bound of cells sent in one values_batch_update request; keeps the
+# payload well below the Sheets API request size limit
+MAX_CELLS_PER_BATCH = 40_000
 
-class GSheet:
-    def __init__(self):
-        self.spreadsheet_name = "Copy MarTech Manager \
-- Ads & Acquisition HW - dataset"
 
-    def _open_spreadsheet(self):
-        google_creds = gspread.service_account_from_dict(SERVICE_ACCOUNT)
-        return google_creds.open(self.spreadsheet_name)
+class GSheet(Source, Sink):
+    '''Handle to a report spreadsheet, the source of the dataset and the
+    sink of the reports in production. Without ``credentials`` (a service
+    account key) the SERVICE_ACCOUNT of constants.py is used.
 
-    def _open_worksheet(self, worksheet_name: str):
-        return self._open_spreadsheet().worksheet(worksheet_name)
+    The authorized clients, the opened spreadsheets and their worksheets
+    are cached on the class, so every ``GSheet`` of a service account in
+    the process shares one OAuth session. The underlying google-auth
+    credentials refresh the access token on their own once it expires.
+
+    Every API request waits for the per-minute quota limiter of its
+    service account, as the quota applies per account, and is retried
+    with backoff on 429/5xx responses.
+    '''
+    _lock = threading.Lock()
+    # Clients and quota limiters by service account, or the one client
+    # and limiter set by use_client
+    _clients: dict[str, gspread.Client] = {}
+    _limiters: dict[str, TokenBucket] = {}
+    _client: t.Optional[gspread.Client] = None
+    _limiter: t.Optional[TokenBucket] = None
+    _spreadsheets: dict[tuple[str, str], gspread.Spreadsheet] = {}
+    _worksheets: dict[tuple[str, str, str], gspread.Worksheet] = {}
+
+    def __init__(
+        self,
+        spreadsheet_name: str = SPREADSHEET_NAME,
+        credentials: t.Optional[dict[str, str]] = None
+    ):
+        super().__init__()
+        self.spreadsheet_name = spreadsheet_name
+        self.name = self.spreadsheet_name
+        self.credentials = (credentials if credentials is not None
+                            else SERVICE_ACCOUNT)
+        self._account = self.credentials.get('client_email', '')
+
+    def _get_client(self) -> gspread.Client:
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            client = self._clients.get(self._account)
+            if client is None:
+                TELEMETRY.count('sheets_auth')
+                client = gspread.service_account_from_dict(self.credentials)
+                self._clients[self._account] = client
+            return client
+
+    def _get_limiter(self) -> t.Optional[TokenBucket]:
+        with self._lock:
+            if self._client is not None:
+                return self._limiter
+            limiter = self._limiters.get(self._account)
+            if limiter is None:
+                limiter = TokenBucket(SHEETS_REQUESTS_PER_MINUTE)
+                self._limiters[self._account] = limiter
+            return limiter
+
+    def _open_spreadsheet(self) -> gspread.Spreadsheet:
+        key = (self._account, self.spreadsheet_name)
+        spreadsheet = self._spreadsheets.get(key)
+        if spreadsheet is None:
+            spreadsheet = self._request(
+                self._get_client().open, self.spreadsheet_name)
+            with self._lock:
+                spreadsheet = self._spreadsheets.setdefault(key, spreadsheet)
+        return spreadsheet
+
+    def _open_worksheet(
+        self,
+        worksheet_name: str,
+        refresh: bool = False
+    ) -> gspread.Worksheet:
+        '''Cached handle of a worksheet; ``refresh`` opens it again, so its
+        properties (e.g. the grid size) are current'''
+        key = (self._account, self.spreadsheet_name, worksheet_name)
+        worksheet = None if refresh else self._worksheets.get(key)
+        if worksheet is None:
+            worksheet = self._request(
+                self._open_spreadsheet().worksheet, worksheet_name)
+            with self._lock:
+                if refresh:
+                    self._worksheets[key] = worksheet
+                else:
+                    worksheet = self._worksheets.setdefault(key, worksheet)
+        return worksheet
+
+    def _request(
+        self,
+        function: t.Callable[..., t.Any],
+        *args: t.Any,
+        **kwargs: t.Any
+    ) -> t.Any:
+        method = getattr(function, '__name__', 'request')
+        TELEMETRY.count('sheets_requests', method=method)
+        return call_with_retry(
+            function, *args, limiter=self._get_limiter(),
+            on_retry=lambda error: TELEMETRY.count(
+                'sheets_retries', method=method,
+                error=type(error).__name__),
+            **kwargs)
+
+    @classmethod
+    def reset_session(cls) -> None:
+        '''Function to drop the cached client and opened handles'''
+        with cls._lock:
+            cls._client = None
+            cls._clients.clear()
+            cls._spreadsheets.clear()
+            cls._worksheets.clear()
+
+    @classmethod
+    def use_client(
+        cls,
+        client: gspread.Client,
+        limiter: t.Optional[TokenBucket] = None
+    ) -> None:
+        '''Function to replace the authorized clients of every service
+        account, e.g. with an offline stand-in; without a limiter requests
+        are not throttled'''
+        cls.reset_session()
+        with cls._lock:
+            cls._client = client
+            cls._limiter = limiter
+
+    def get_revision(self) -> str:
+        '''Function to get the Drive modifiedTime of the spreadsheet'''
+        return self._request(self._open_spreadsheet().get_lastUpdateTime)
 
     def get_all_data(
         self,
@@ -23,7 +150,38 @@ class GSheet:
     ) -> list[dict[str, t.Any]]:
         '''Function to get all info from selected worksheet'''
         worksheet = self._open_worksheet(worksheet_name)
-        return worksheet.get_all_records()
+        return self._request(worksheet.get_all_records)
+
+    def get_values(
+        self,
+        worksheet_name: str
+    ) -> list[list[t.Any]]:
+        '''Function to get raw cell values of selected worksheet, header
+        first. Numbers come unformatted, dates as displayed strings'''
+        worksheet = self._open_worksheet(worksheet_name)
+        return self._request(
+            worksheet.get_values,
+            value_render_option='UNFORMATTED_VALUE',
+            date_time_render_option='FORMATTED_STRING')
+
+    def iter_values(
+        self,
+        worksheet_name: str,
+        chunk_rows: int
+    ) -> t.Iterator[list[list[t.Any]]]:
+        '''Function to page through selected worksheet in row ranges of
+        chunk_rows rows, the first chunk starts with the header'''
+        # Sheets trims the empty trailing rows of every page, so only the
+        # grid size tells where the worksheet ends; the properties of the
+        # cached handle date from when it was opened and miss added rows
+        worksheet = self._open_worksheet(worksheet_name, refresh=True)
+        for start in range(1, worksheet.row_count + 1, chunk_rows):
+            values = self._request(
+                worksheet.get_values, f'{start}:{start + chunk_rows - 1}',
+                value_render_option='UNFORMATTED_VALUE',
+                date_time_render_option='FORMATTED_STRING')
+            if values:
+                yield values
 
     def update_row(
         self,
@@ -32,4 +190,67 @@ class GSheet:
         values: list[list[str]]
     ) -> list[list[str]]:
         '''Function to insert/update info to selected area. Example:'A7:E9'''
-        return self._open_worksheet(worksheet_name).update(cells_scope, values)
+        return self._request(self._open_worksheet(worksheet_name).update,
+                             cells_scope, values)
+
+    def flush(self, worksheet_name: t.Optional[str] = None) -> list[t.Any]:
+        '''Function to send queued updates, one values_batch_update per
+        worksheet (split in chunks of MAX_CELLS_PER_BATCH cells) followed
+        by one batch_format with the queued number formats. Worksheets
+        are published concurrently'''
+        queued = self._take_pending(worksheet_name)
+        results = run_concurrently(
+            [lambda name=name, updates=updates, formats=formats:
+             self._send(name, updates, formats)
+             for name, updates, formats in queued],
+            SHEETS_MAX_WORKERS)
+        return [response for responses in results for response in responses]
+
+    def _send(
+        self,
+        worksheet_name: str,
+        updates: list[tuple[str, list[list[t.Any]]]],
+        formats: list[dict[str, t.Any]]
+    ) -> list[t.Any]:
+        responses = []
+        for chunk in _chunk_updates(worksheet_name, updates):
+            body = {'valueInputOption': 'RAW', 'data': chunk}
+            TELEMETRY.count('sheets_cells_written', sum(
+                len(line) for data in chunk for line in data['values']))
+            TELEMETRY.count('sheets_bytes_sent',
+                            len(json.dumps(body, default=str)))
+            responses.append(self._request(
+                self._open_spreadsheet().values_batch_update, body))
+        if formats:
+            TELEMETRY.count('sheets_bytes_sent', len(json.dumps(formats)))
+            responses.append(self._request(
+                self._open_worksheet(worksheet_name).batch_format, formats))
+        return responses
+
+
+def _chunk_updates(
+    worksheet_name: str,
+    updates: list[tuple[str, list[list[t.Any]]]]
+) -> t.Iterator[list[dict[str, t.Any]]]:
+    '''Group queued ranges into batches of at most MAX_CELLS_PER_BATCH cells;
+    a range larger than that is split by rows'''
+    chunk: list[dict[str, t.Any]] = []
+    chunk_cells = 0
+    for cells_scope, values in updates:
+        row, col = a1_to_rowcol(cells_scope.split(':')[0])
+        width = max((len(line) for line in values), default=1) or 1
+        rows_per_part = max(MAX_CELLS_PER_BATCH // width, 1)
+        for offset in range(0, max(len(values), 1), rows_per_part):
+            part = values[offset:offset + rows_per_part]
+            cells = len(part) * width
+            if chunk and chunk_cells + cells > MAX_CELLS_PER_BATCH:
+                yield chunk
+                chunk, chunk_cells = [], 0
+            chunk.append({
+                'range': absolute_range_name(
+                    worksheet_name, rowcol_to_a1(row + offset, col)),
+                'values': part,
+            })
+            chunk_cells += cells
+    if chunk:
+        yield chunk
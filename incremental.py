@@ -0,0 +1,91 @@
+import os
+import typing as t
+
+import pandas as pd
+
+from aggregation import build_cube, merge_cubes
+from constants import SNAPSHOT_DIR
+
+
+def period_hashes(df: pd.DataFrame, period: str = 'Day') -> pd.Series:
+    '''Order independent hash of the rows of every period'''
+    row_hashes = pd.util.hash_pandas_object(df, index=False)
+    # Sum wraps around in uint64, which keeps it a valid hash of the set
+    return row_hashes.groupby(df[period].values, observed=True).sum()
+
+
+def aggregate_chunks(
+    chunks: t.Iterable[pd.DataFrame],
+    dimension: str
+) -> tuple[pd.Series, pd.DataFrame]:
+    '''Period hashes and cube of a dataset read in chunks; every chunk is
+    reduced to its partial aggregates before the next one is read'''
+    hashes, cube = None, None
+    for chunk in chunks:
+        chunk_hashes = period_hashes(chunk)
+        chunk_cube = build_cube(chunk, dimension)
+        if cube is None:
+            hashes, cube = chunk_hashes, chunk_cube
+            continue
+        hashes = pd.concat([hashes, chunk_hashes]).groupby(level=0).sum()
+        cube = merge_cubes([cube, chunk_cube])
+    return hashes, cube
+
+
+class Snapshot:
+    '''State of the previous run kept on local disk: the hash of every
+    day of the dataset with the day-level cube aggregated from it, and
+    what was published to every worksheet.
+    '''
+
+    def __init__(self, name: str = 'dataset', directory: str = SNAPSHOT_DIR):
+        self.path = os.path.join(directory, f'{name}.pkl')
+        state = (pd.read_pickle(self.path)
+                 if os.path.exists(self.path) else {})
+        self.period_hashes: t.Optional[pd.Series] = state.get(
+            'period_hashes')
+        self.cube: t.Optional[pd.DataFrame] = state.get('cube')
+        self.published: dict[str, dict[str, t.Any]] = (
+            state.get('published', {}))
+
+    def changed_periods(self, hashes: pd.Series) -> t.Optional[list[int]]:
+        '''Periods whose rows were added, edited or removed since the cube
+        was built; None when there is nothing to compare with'''
+        previous = self.period_hashes if self.cube is not None else None
+        if previous is None:
+            return None
+        months = previous.index.union(hashes.index)
+        return [month for month in months
+                if previous.get(month) != hashes.get(month)]
+
+    def layout(self, worksheet_name: str) -> t.Optional[dict[str, t.Any]]:
+        '''What the worksheet was last published with'''
+        return self.published.get(worksheet_name)
+
+    def refresh_cube(
+        self,
+        df: pd.DataFrame,
+        dimension: str,
+        periods: t.Optional[list[int]]
+    ) -> pd.DataFrame:
+        '''Cube of the dataset where only the slices of the changed periods
+        are aggregated again and the rest is reused from the snapshot'''
+        if periods is None or self.cube is None:
+            return build_cube(df, dimension)
+        kept = self.cube[
+            ~self.cube.index.get_level_values('Day').isin(periods)]
+        fresh = build_cube(df[df['Day'].isin(periods)], dimension)
+        return pd.concat([kept, fresh]).sort_index()
+
+    def save(
+        self,
+        hashes: pd.Series,
+        cube: pd.DataFrame,
+        layouts: dict[str, dict[str, t.Any]]
+    ) -> None:
+        '''Store the cube and record the worksheets written in this run'''
+        self.period_hashes, self.cube = hashes, cube
+        self.published.update(layouts)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        pd.to_pickle({'period_hashes': self.period_hashes, 'cube': self.cube,
+                      'published': self.published}, self.path)
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import typing as t
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from aggregation import SparseTable
+from backends import Sink
+from formatting import CellFormat
+
+# A pivot table together with the title written into its top left cell
+NamedTable = tuple[str, pd.DataFrame]
+
+# What was written to a worksheet: the layout signature, the content
+# hash of every column of every block (None where nothing was written yet)
+# and the blocks whose number format was sent
+Published = dict[str, t.Any]
+
+
+class SheetLayout:
+    '''Places named pivot tables on a worksheet without overlaps.
+
+    Tables are given as columns of tables; each column is stacked top to
+    bottom and the columns are placed left to right. Every block takes
+    ``1 + rows`` rows (header with the title in its first cell, then one
+    line per index value) and ``1 + columns`` columns, so block positions
+    follow from the real table shapes instead of hard-coded anchors.
+    '''
+
+    def __init__(
+        self,
+        columns: list[list[NamedTable]],
+        row_gap: int = 1,
+        col_gap: int = 1
+    ):
+        self.columns = columns
+        self.row_gap = row_gap
+        self.col_gap = col_gap
+        # title -> (row, col, height, width), 0-based
+        self.blocks: dict[str, tuple[int, int, int, int]] = {}
+        self.height = 0
+        self.width = 0
+        self._place()
+
+    def _place(self) -> None:
+        left = 0
+        for tables in self.columns:
+            top = 0
+            column_width = 0
+            for title, table in tables:
+                height, width = table.shape[0] + 1, table.shape[1] + 1
+                self.blocks[title] = (top, left, height, width)
+                top += height + self.row_gap
+                column_width = max(column_width, width)
+            self.height = max(self.height, top - self.row_gap)
+            self.width = max(self.width, left + column_width)
+            left += column_width + self.col_gap
+
+    @property
+    def signature(self) -> dict[str, t.Any]:
+        '''Positions and labels of every block; two layouts with the same
+        signature put every value into the same cell'''
+        return {
+            title: (self.blocks[title], tuple(table.index),
+                    tuple(table.columns))
+            for tables in self.columns
+            for title, table in tables
+        }
+
+    def anchor(self, title: str) -> str:
+        '''A1 notation of the top left cell of the named table'''
+        row, col, _, _ = self.blocks[title]
+        return rowcol_to_a1(row + 1, col + 1)
+
+    def values_range(self, title: str) -> str:
+        '''A1 range of the values of the named table, without its labels'''
+        row, col, height, width = self.blocks[title]
+        return '{}:{}'.format(rowcol_to_a1(row + 2, col + 2),
+                              rowcol_to_a1(row + height, col + width))
+
+    def grid(self) -> list[list[t.Any]]:
+        '''Render every table into one rectangular grid starting at A1'''
+        grid: list[list[t.Any]] = [[''] * self.width
+                                   for _ in range(self.height)]
+        for tables in self.columns:
+            for title, table in tables:
+                row, col, height, width = self.blocks[title]
+                grid[row][col:col + width] = (
+                    [title] + [str(name) for name in table.columns])
+                values = table.values.tolist()
+                for offset, row_name in enumerate(table.index.tolist()):
+                    grid[row + 1 + offset][col:col + width] = (
+                        [row_name] + values[offset])
+        return grid
+
+
+def _column_hashes(
+    layout: SheetLayout,
+    grid: list[list[t.Any]]
+) -> dict[str, list[str]]:
+    '''Content hash of every column (header, labels or values) of every
+    block of the rendered grid'''
+    hashes = {}
+    for title, (row, col, height, width) in layout.blocks.items():
+        lines = grid[row:row + height]
+        hashes[title] = [
+            hashlib.blake2b(
+                json.dumps([line[col + offset] for line in lines],
+                           default=str).encode(),
+                digest_size=8).hexdigest()
+            for offset in range(width)]
+    return hashes
+
+
+class LayoutChanged(Exception):
+    '''A partial write was asked for a worksheet whose layout is not the
+    one it was last published with'''
+
+
+def _written_offsets(
+    table: SparseTable,
+    labels: t.Optional[pd.Index]
+) -> list[int]:
+    '''Block columns to write: all of them for None, the label column
+    and the columns of ``labels`` otherwise'''
+    if labels is None:
+        return list(range(table.shape[1] + 1))
+    if not len(labels):
+        return []
+    labels = set(labels)
+    return [0] + [offset + 1 for offset, label in enumerate(table.columns)
+                  if label in labels]
+
+
+def write_tables(
+    sink: Sink,
+    worksheet_name: str,
+    columns: list[list[tuple[str, SparseTable, CellFormat,
+                             t.Optional[pd.Index]]]],
+    previous: t.Optional[Published] = None
+) -> Published:
+    '''Queue numeric tables as one grid starting at A1, each block with the
+    number format of its CellFormat, and return what was published. The
+    sparse tables are only made dense here, when they are rendered.
+
+    Every table comes with the labels of the columns to write (None for
+    all of them). When all are written and the layout has changed since
+    the ``previous`` publication, the whole grid is queued and the cells
+    of a larger previous layout are blanked.
+
+    Otherwise only the columns to write whose content hash changed are
+    queued, one range per run of adjacent columns, so an unchanged
+    worksheet queues nothing. The hashes are those of the last
+    publication through this code; edits made by hand in the sheet are
+    not detected. A partial write leaves every other cell as it is and
+    raises LayoutChanged when the blocks are no longer where they were
+    published.
+    '''
+    layout = SheetLayout([
+        [(title, cell_format.render(table.to_dense()))
+         for title, table, cell_format, _ in tables]
+        for tables in columns
+    ])
+    grid = layout.grid()
+    hashes = _column_hashes(layout, grid)
+    tables = {title: (table, cell_format, _written_offsets(table, labels))
+              for column in columns
+              for title, table, cell_format, labels in column}
+    partial = any(len(written) < layout.blocks[title][3]
+                  for title, (_, _, written) in tables.items())
+    if previous is None or previous['signature'] != layout.signature:
+        if partial and previous is not None:
+            raise LayoutChanged(
+                f'The layout of {worksheet_name!r} changed since it was '
+                'published; publish the whole report first or write the '
+                'selection to another worksheet')
+        if not partial:
+            return _write_grid(sink, worksheet_name, layout, grid, hashes,
+                               tables, previous)
+    # Columns never written have no hash
+    old = (previous['columns'] if previous is not None
+           else {title: [None] * len(block_hashes)
+                 for title, block_hashes in hashes.items()})
+    formatted = set(previous['formatted'] if previous is not None else [])
+    published_hashes = {}
+    for title, (table, cell_format, written) in tables.items():
+        changed = [offset for offset in written
+                   if hashes[title][offset] != old[title][offset]]
+        _write_columns(sink, worksheet_name, layout, grid, title, changed)
+        if changed and title not in formatted and not table.empty:
+            sink.buffer_format(worksheet_name, layout.values_range(title),
+                               cell_format.number_format)
+            formatted.add(title)
+        published_hashes[title] = [
+            hashes[title][offset] if offset in written
+            else old[title][offset]
+            for offset in range(len(hashes[title]))]
+    return {'signature': layout.signature, 'columns': published_hashes,
+            'formatted': sorted(formatted)}
+
+
+def _write_grid(
+    sink: Sink,
+    worksheet_name: str,
+    layout: SheetLayout,
+    grid: list[list[t.Any]],
+    hashes: dict[str, list[str]],
+    tables: dict[str, tuple[SparseTable, CellFormat, list[int]]],
+    previous: t.Optional[Published]
+) -> Published:
+    '''Queue the whole grid and the format of every block'''
+    if previous is not None:
+        blocks = [block for block, _, _ in previous['signature'].values()]
+        height = max(row + height for row, _, height, _ in blocks)
+        width = max(col + width for _, col, _, width in blocks)
+        grid = [line + [''] * (width - len(line)) for line in grid]
+        grid += [[''] * max(width, layout.width)
+                 for _ in range(height - len(grid))]
+    sink.buffer_update(worksheet_name, 'A1', grid)
+    formatted = []
+    for title, (table, cell_format, _) in tables.items():
+        if not table.empty:
+            sink.buffer_format(worksheet_name, layout.values_range(title),
+                               cell_format.number_format)
+            formatted.append(title)
+    return {'signature': layout.signature, 'columns': hashes,
+            'formatted': sorted(formatted)}
+
+
+def _write_columns(
+    sink: Sink,
+    worksheet_name: str,
+    layout: SheetLayout,
+    grid: list[list[t.Any]],
+    title: str,
+    offsets: list[int]
+) -> None:
+    '''Queue the given columns of a block, adjacent ones in one range'''
+    row, col, height, _ = layout.blocks[title]
+    offsets = sorted(offsets)
+    while offsets:
+        first = last = offsets.pop(0)
+        while offsets and offsets[0] == last + 1:
+            last = offsets.pop(0)
+        sink.buffer_update(
+            worksheet_name, rowcol_to_a1(row + 1, col + first + 1),
+            [line[col + first:col + last + 1]
+             for line in grid[row:row + height]])
@@ -0,0 +1,131 @@
+import abc
+
+import pandas as pd
+
+from aggregation import (OVER, DivisionPolicy, SparseTable, change_pivot,
+                         pivot, ratio_pivot)
+from constants import UNDEFINED_RATIO, ZERO_DIVISION
+
+
+class Metric(abc.ABC):
+    '''One table of a report, derived from a (dimension, period) cube.
+
+    ``style`` names the kind of numbers the table holds ('count',
+    'change', 'rate' or 'ratio'); every report maps styles to the cell
+    formats it renders them with. '{over}' in the title stands for the
+    period-over-period name of the time bucket, e.g. 'MoM'. Divisions
+    by zero follow the DivisionPolicy of the report.
+    '''
+    style = 'count'
+
+    def __init__(self, title: str):
+        self.title = title
+
+    def heading(self, period: str) -> str:
+        return self.title.format(over=OVER[period])
+
+    @abc.abstractmethod
+    def table(
+        self,
+        cube: pd.DataFrame,
+        policy: DivisionPolicy
+    ) -> SparseTable:
+        ...
+
+
+class Total(Metric):
+    '''Sum of a measure per dimension and period'''
+
+    def __init__(self, title: str, measure: str):
+        super().__init__(title)
+        self.measure = measure
+
+    def table(
+        self,
+        cube: pd.DataFrame,
+        policy: DivisionPolicy
+    ) -> SparseTable:
+        return pivot(cube, self.measure)
+
+
+class Change(Metric):
+    '''Period over period change of a measure, as a fraction'''
+    style = 'change'
+
+    def __init__(self, title: str, measure: str):
+        super().__init__(title)
+        self.measure = measure
+
+    def table(
+        self,
+        cube: pd.DataFrame,
+        policy: DivisionPolicy
+    ) -> SparseTable:
+        return change_pivot(cube, self.measure, policy)
+
+
+class Ratio(Metric):
+    '''numerator * scale / denominator of the summed measures'''
+
+    def __init__(
+        self,
+        title: str,
+        numerator: str,
+        denominator: str,
+        scale: float = 1,
+        style: str = 'ratio'
+    ):
+        super().__init__(title)
+        self.numerator = numerator
+        self.denominator = denominator
+        self.scale = scale
+        self.style = style
+
+    def table(
+        self,
+        cube: pd.DataFrame,
+        policy: DivisionPolicy
+    ) -> SparseTable:
+        return ratio_pivot(cube, self.numerator, self.denominator, policy,
+                           scale=self.scale)
+
+
+TOTALS = [
+    Total('Impressions, #', 'Impressions'),
+    Total('Installs, #', 'App installs'),
+    Total('Mobile app registrations completed, #',
+          'Mobile app registrations completed'),
+    Total('Purchases, #', 'Purchases'),
+    Total('Unique purchases, #', 'Unique purchases'),
+    Total('Amount spent (EUR)', 'Amount spent (EUR)'),
+    Total('Revenue (EUR)', 'Revenue'),
+]
+
+CHANGES = [
+    Change('Impressions Change {over}', 'Impressions'),
+    Change('Installs Change {over}', 'App installs'),
+    Change('Regs Change {over}', 'Mobile app registrations completed'),
+    Change('Purchases Change {over}', 'Purchases'),
+    Change('Unique Purchases Change {over}', 'Unique purchases'),
+    Change('Amount Spent Change {over}', 'Amount spent (EUR)'),
+    Change('Revenue Change {over}', 'Revenue'),
+]
+
+# Cost per mille, conversion rates, cost per install, registration and
+# order and the average order value
+RATIOS = [
+    Ratio('CPM', 'Amount spent (EUR)', 'Impressions', scale=1_000),
+    Ratio('CR Installs 2 Registrations',
+          'Mobile app registrations completed', 'App installs',
+          style='rate'),
+    Ratio('CR Registrations 2 Purchases',
+          'Purchases', 'Mobile app registrations completed', style='rate'),
+    Ratio('CPI (EUR)', 'Amount spent (EUR)', 'App installs'),
+    Ratio('CPRegistration (EUR)', 'Amount spent (EUR)',
+          'Mobile app registrations completed'),
+    Ratio('CPO (EUR)', 'Amount spent (EUR)', 'Purchases'),
+    Ratio('AOV (EUR)', 'Revenue', 'Purchases'),
+]
+
+# Zero denominator policy of every report
+DIVISION = DivisionPolicy(ZERO_DIVISION, UNDEFINED_RATIO)
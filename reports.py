@@ -0,0 +1,312 @@
+import copy
+import typing as t
+
+import pandas as pd
+
+from aggregation import (DivisionPolicy, Labels, SparseTable, rebucket,
+                         rollup, top_labels, with_totals)
+from backends import DryRunSink, Sink, Source, open_sink, open_source
+from constants import (DATASET, DATASET_CHUNK_ROWS, PERIOD, SINK, SOURCE,
+                       STORE_PATH, TELEMETRY_FILE, TOP_CAMPAIGNS,
+                       TOP_MEASURE)
+from dataset import iter_dataset, load_dataset
+from formatting import AMOUNT, CHANGE, DECIMAL, NUMBER, RATE, CellFormat
+from incremental import Snapshot, aggregate_chunks, period_hashes
+from layout import write_tables
+from store import AggregateStore
+from metrics import CHANGES, DIVISION, RATIOS, TOTALS, Metric
+from telemetry import TELEMETRY
+
+# Finest grain the dataset is aggregated at; every report dimension is a
+# rollup of it
+FINEST_DIMENSION = 'Campaign name'
+
+# Report dimensions derived from the distinct campaign names; campaigns
+# are named '<country>, <campaign>, <platform>'
+DIMENSIONS: dict[str, Labels] = {
+    'Campaign name': lambda campaigns: campaigns,
+    'Country': lambda campaigns: (
+        campaigns.str.split(',', n=1).str[0].str.strip()),
+}
+
+
+class Report:
+    '''Metric tables of one dimension written to one worksheet.
+
+    ``columns`` are stacked side by side, each one top to bottom;
+    ``formats`` maps the style of a metric to its cell format. Every table
+    ends with a monthly total row and, given a coarser ``subtotals``
+    dimension, has a subtotal row after the rows of each of its values.
+    Ratios and changes divide by zero according to ``division``. Given
+    ``top``, only the rows of the ``top`` values with the largest sums of
+    ``rank_by`` are kept and the rest is summed into an 'Other' row, so
+    its ratios are those of the summed measures. A report restricted to
+    some ``selected`` metrics keeps the layout of all of them and writes
+    only the blocks of the selected ones.
+    '''
+
+    def __init__(
+        self,
+        dimension: str,
+        worksheet_name: str,
+        columns: list[list[Metric]],
+        formats: dict[str, CellFormat],
+        subtotals: t.Optional[str] = None,
+        division: DivisionPolicy = DIVISION,
+        top: t.Optional[int] = None,
+        rank_by: str = TOP_MEASURE
+    ):
+        self.dimension = dimension
+        self.worksheet_name = worksheet_name
+        self.columns = columns
+        self.formats = formats
+        self.subtotals = subtotals
+        self.division = division
+        self.top = top
+        self.rank_by = rank_by
+        self.selected: t.Optional[set[str]] = None
+
+    def select(
+        self,
+        patterns: list[str],
+        period: str = PERIOD
+    ) -> 'Report':
+        '''Report writing only the metrics whose titles, or headings for
+        ``period`` (e.g. 'Purchases Change MoM'), contain one of the
+        patterns (case insensitive)'''
+        patterns = [pattern.lower() for pattern in patterns]
+        report = copy.copy(self)
+        report.selected = {
+            metric.title
+            for metrics in self.columns for metric in metrics
+            if any(pattern in name.lower() for pattern in patterns
+                   for name in (metric.title, metric.heading(period)))}
+        return report
+
+    def on_worksheet(self, worksheet_name: str) -> 'Report':
+        '''The same report written to another worksheet'''
+        report = copy.copy(self)
+        report.worksheet_name = worksheet_name
+        return report
+
+    def ranked(self, top: t.Optional[int], rank_by: str) -> 'Report':
+        '''The same report keeping the ``top`` rows ranked by a measure
+        (every row for None)'''
+        report = copy.copy(self)
+        report.top, report.rank_by = top, rank_by
+        return report
+
+    def tables(
+        self,
+        cube: pd.DataFrame,
+        period: str = PERIOD,
+        months: t.Optional[list[str]] = None
+    ) -> 'Tables':
+        '''Tables of the report computed from a (dimension, period) cube,
+        each with the columns to write: all of them, only those of the
+        periods in ``months`` when given, none if it is not selected.
+        The ``top`` rows are ranked on every period whatever ``months``,
+        so a selection keeps the rows of the full report layout.'''
+        cube = with_totals(
+            cube, None if self.subtotals is None
+            else DIMENSIONS[self.subtotals],
+            None if self.top is None
+            else top_labels(cube, self.top, self.rank_by))
+        tables = []
+        for metrics in self.columns:
+            column = []
+            for metric in metrics:
+                table = metric.table(cube, self.division)
+                written = None
+                if self.selected is not None and (
+                        metric.title not in self.selected):
+                    written = pd.Index([])
+                elif months is not None:
+                    written = _selected(table.columns, months)
+                column.append((metric.heading(period), table,
+                               self.formats[metric.style], written))
+            tables.append(column)
+        return tables
+
+
+COUNTRIES = Report(
+    'Country', 'pivot tables - countries data',
+    [TOTALS, CHANGES, RATIOS],
+    {'count': NUMBER, 'change': CHANGE, 'rate': RATE, 'ratio': DECIMAL},
+)
+
+CAMPAIGNS = Report(
+    'Campaign name', 'pivot tables - campaigns data',
+    [TOTALS, CHANGES, RATIOS],
+    {'count': AMOUNT, 'change': CHANGE, 'rate': RATE, 'ratio': AMOUNT},
+    subtotals='Country',
+    top=TOP_CAMPAIGNS,
+)
+
+
+def _period_months(label: str) -> set[str]:
+    '''YYYY-MM months a period label falls in (a day or week by its
+    start, a quarter by all three months)'''
+    if 'Q' in label:
+        year, quarter = label.split('Q')
+        return {f'{year}-{3 * int(quarter) - offset:02d}'
+                for offset in range(3)}
+    return {label[:7]}
+
+
+def _selected(labels: pd.Index, months: list[str]) -> pd.Index:
+    '''Labels of the periods in ``months``'''
+    return pd.Index([label for label in labels
+                     if _period_months(str(label)) & set(months)])
+
+
+# Tables of every report worksheet, in columns of (title, table, format,
+# labels of the columns to write or None for all of them)
+Tables = list[list[tuple[str, SparseTable, CellFormat,
+                         t.Optional[pd.Index]]]]
+
+
+def aggregate_dataset(
+    df: pd.DataFrame,
+    snapshot: Snapshot
+) -> tuple[pd.Series, pd.DataFrame]:
+    '''Day hashes and finest, day-level cube of the dataset; days whose
+    rows did not change since the snapshot are reused from it'''
+    with TELEMETRY.stage('aggregate', profile=True):
+        hashes = period_hashes(df)
+        cube = snapshot.refresh_cube(
+            df, FINEST_DIMENSION, snapshot.changed_periods(hashes))
+    return hashes, cube
+
+
+def load_cube(
+    source: Source,
+    snapshot: Snapshot,
+    worksheet_name: str = DATASET,
+    refresh: bool = False
+) -> tuple[pd.Series, pd.DataFrame]:
+    '''Day hashes and finest cube of the dataset worksheet, fetched
+    again whatever the local cache holds given ``refresh``'''
+    if DATASET_CHUNK_ROWS is None:
+        # Every run while the spreadsheet is unchanged loads the dataset
+        # from the local cache
+        with TELEMETRY.stage('load'):
+            df = load_dataset(source, worksheet_name, refresh=refresh)
+        return aggregate_dataset(df, snapshot)
+    # Histories too large for one response are read page by page and only
+    # the partial aggregates of every page are kept
+    with TELEMETRY.stage('load'):
+        return aggregate_chunks(
+            iter_dataset(source, worksheet_name, DATASET_CHUNK_ROWS),
+            FINEST_DIMENSION)
+
+
+def build_tables(
+    reports: list[Report],
+    cube: pd.DataFrame,
+    months: t.Optional[list[str]] = None,
+    period: str = PERIOD
+) -> dict[str, Tables]:
+    '''Tables of every report by worksheet name with one column per
+    ``period`` bucket; only the periods in ``months`` are written when
+    given, but the tables keep every period so that their blocks stay
+    where a full run puts them'''
+    # Time buckets, coarser dimensions and totals are sums of the finest
+    # cube
+    with TELEMETRY.stage('aggregate', profile=True):
+        cube = rebucket(cube, period)
+    cubes = {FINEST_DIMENSION: cube}
+    tables = {}
+    for report in reports:
+        if report.dimension not in cubes:
+            with TELEMETRY.stage('aggregate', profile=True):
+                cubes[report.dimension] = rollup(
+                    cube, DIMENSIONS[report.dimension], report.dimension)
+        with TELEMETRY.stage('format', profile=True):
+            tables[report.worksheet_name] = report.tables(
+                cubes[report.dimension], period, months)
+    return tables
+
+
+def publish_tables(
+    sink: Sink,
+    snapshot: Snapshot,
+    tables: dict[str, Tables]
+) -> tuple[dict[str, dict[str, t.Any]], list[t.Any]]:
+    '''Write the tables of every worksheet to the sink; returns what was
+    published by snapshot key and the result of the sink flush'''
+    layouts = {}
+    with TELEMETRY.stage('format', profile=True):
+        for worksheet_name, worksheet_tables in tables.items():
+            # The same worksheet of another sink is published separately
+            target = f'{sink.name}:{worksheet_name}'
+            layouts[target] = write_tables(
+                sink, worksheet_name, worksheet_tables,
+                previous=snapshot.layout(target))
+    # Publish the grids and their number formats
+    with TELEMETRY.stage('publish'):
+        published = sink.flush()
+    return layouts, published
+
+
+def update_reports(
+    reports: list[Report],
+    source: Source,
+    sink: Sink,
+    snapshot: Snapshot,
+    months: t.Optional[list[str]] = None,
+    period: str = PERIOD,
+    dry_run: bool = False,
+    refresh: bool = False
+) -> list[t.Any]:
+    '''Publish every report from the dataset and record the run in the
+    snapshot and the history; returns the result of the sink flush'''
+    hashes, cube = load_cube(source, snapshot, refresh=refresh)
+    layouts, published = publish_tables(
+        sink, snapshot, build_tables(reports, cube, months, period))
+    if not dry_run:
+        with TELEMETRY.stage('snapshot'):
+            snapshot.save(hashes, cube, layouts)
+        if STORE_PATH is not None:
+            with TELEMETRY.stage('history'):
+                AggregateStore(STORE_PATH).append(cube, source.name)
+    return published
+
+
+def run_reports(
+    reports: list[Report],
+    source: t.Optional[Source] = None,
+    sink: t.Optional[Sink] = None,
+    months: t.Optional[list[str]] = None,
+    dry_run: bool = False,
+    period: str = PERIOD,
+    refresh: bool = False
+) -> list[t.Any]:
+    '''Load and aggregate the dataset once and publish every report.
+
+    Days whose rows did not change since the previous run are reused
+    from the snapshot, and only the block columns whose content changed
+    since they were published are rewritten while a layout did not move.
+    The time of every stage and the Sheets traffic are written to
+    TELEMETRY_FILE, the aggregates of the run are added to the history
+    at STORE_PATH. Source and sink default to the SOURCE and SINK specs.
+
+    Tables have a column per ``period`` bucket ('D', 'W', 'M' or 'Q');
+    given ``months``, only those of the periods in these months.
+    A dry run queues the writes on a DryRunSink and returns what would
+    be written, the published state is left as it was. ``refresh``
+    fetches the dataset even while the local cache is within its TTL.
+    '''
+    TELEMETRY.reset()
+    source = source if source is not None else open_source(SOURCE)
+    sink = sink if sink is not None else open_sink(SINK)
+    if dry_run:
+        sink = DryRunSink(sink.name)
+    published = update_reports(reports, source, sink, Snapshot(), months,
+                               period, dry_run, refresh)
+    TELEMETRY.write(TELEMETRY_FILE)
+    return published
+
+
+# Reports selectable from the command line
+REPORTS = {'countries': COUNTRIES, 'campaigns': CAMPAIGNS}
@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from gspread.exceptions import APIError
+
+T = t.TypeVar('T')
+
+
+class TokenBucket:
+    '''Thread-safe limiter allowing ``rate`` calls per ``period`` seconds
+    with bursts of up to ``capacity`` calls'''
+
+    def __init__(
+        self,
+        rate: float,
+        period: float = 60.0,
+        capacity: t.Optional[float] = None
+    ):
+        self.fill_rate = rate / period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        '''Block until a call is allowed'''
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.fill_rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    '''Quota errors (429), server errors (5xx) and dropped connections'''
+    if isinstance(error, APIError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def call_with_retry(
+    function: t.Callable[..., T],
+    *args: t.Any,
+    limiter: t.Optional[TokenBucket] = None,
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 64.0,
+    on_retry: t.Optional[t.Callable[[Exception], None]] = None,
+    **kwargs: t.Any
+) -> T:
+    '''Call a Sheets API function under the limiter, retrying retryable
+    errors with exponential backoff and full jitter.
+
+    Only idempotent calls may be passed: reads, and writes of values or
+    formats to fixed ranges, which leave the sheet in the same state
+    however many times they are repeated. ``on_retry`` is told about
+    every error that is retried.
+    '''
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            if attempt == retries or not is_retryable(error):
+                raise
+            if on_retry is not None:
+                on_retry(error)
+            time.sleep(random.uniform(
+                0, min(max_delay, base_delay * 2 ** attempt)))
+            attempt += 1
+
+
+def run_concurrently(
+    functions: t.Iterable[t.Callable[[], T]],
+    max_workers: int
+) -> list[T]:
+    '''Run independent calls in a thread pool, results in call order'''
+    functions = list(functions)
+    if len(functions) <= 1:
+        return [function() for function in functions]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(function) for function in functions]
+        return [future.result() for future in futures]
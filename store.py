@@ -0,0 +1,257 @@
+'''History of the aggregates of every report run, kept in a local SQLite
+database and queried without reading the dataset again.
+
+Every run appends the day-level cube of the finest dimension as a new
+snapshot; any table of the reports, for any dimension, time bucket and
+snapshot, is computed from it:
+
+    store = AggregateStore()
+    store.table('CPO (EUR)', 'Country', start='2023-01', end='2023-06')
+    store.table('Amount spent (EUR)', 'Campaign name', period='Q')
+    store.restated('Purchases, #', 'Country', before=3)
+
+Runs of every source share the database: by default a query reads the
+latest snapshot of any source, ``source`` restricts it to one of them.
+'''
+import datetime
+import os
+import sqlite3
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (MEASURES, DivisionPolicy, period_labels, rebucket,
+                         rollup, with_totals)
+from constants import PERIOD, STORE_PATH
+from metrics import CHANGES, DIVISION, RATIOS, TOTALS, Metric
+
+
+def find_metric(name: str, period: str = PERIOD) -> Metric:
+    '''Metric of the reports titled ``name``, e.g. 'CPO (EUR)' or
+    'Purchases Change MoM' (case insensitive)'''
+    for metric in TOTALS + CHANGES + RATIOS:
+        if name.lower() in (metric.title.lower(),
+                            metric.heading(period).lower()):
+            return metric
+    raise KeyError(f'No report table is titled {name!r}')
+
+
+def _day(timestamp: pd.Timestamp) -> int:
+    '''Day code (days since the epoch) of a date'''
+    return (timestamp - pd.Timestamp(0)).days
+
+
+class AggregateStore:
+    '''Snapshots of the finest day-level cube in a SQLite database: a
+    ``snapshots`` table with the time, source and dimension of every run
+    and an ``aggregates`` table with one row per (snapshot, dimension
+    value, day) and one column per measure.
+    '''
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Runs of a batch append concurrently
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY '
+            'AUTOINCREMENT, taken_at TEXT, source TEXT, dimension TEXT)')
+        measures = ', '.join(f'"{measure}" REAL' for measure in MEASURES)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS aggregates (snapshot INTEGER, '
+            f'key TEXT, day INTEGER, {measures})')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS aggregates_snapshot_day '
+            'ON aggregates (snapshot, day)')
+        return connection
+
+    def append(self, cube: pd.DataFrame, source: str = '') -> int:
+        '''Store a (dimension, day) cube as a new snapshot of ``source``;
+        returns the id of the snapshot'''
+        taken_at = datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec='seconds')
+        rows = cube[MEASURES].reset_index()
+        rows.columns = ['key', 'day', *MEASURES]
+        rows['key'] = rows['key'].astype(str)
+        rows['day'] = rows['day'].astype('int64')
+        with self._connect() as connection:
+            snapshot = connection.execute(
+                'INSERT INTO snapshots (taken_at, source, dimension) '
+                'VALUES (?, ?, ?)',
+                (taken_at, source, cube.index.names[0])).lastrowid
+            rows.insert(0, 'snapshot', snapshot)
+            rows.to_sql('aggregates', connection, if_exists='append',
+                        index=False)
+        return snapshot
+
+    def snapshots(self, source: t.Optional[str] = None) -> pd.DataFrame:
+        '''Time, source and dimension of every snapshot, or of those of
+        ``source``, by id'''
+        with self._connect() as connection:
+            return pd.read_sql_query(
+                'SELECT id, taken_at, source, dimension FROM snapshots'
+                + ('' if source is None else ' WHERE source = ?')
+                + ' ORDER BY id', connection, index_col='id',
+                params=() if source is None else (source,))
+
+    def cube(
+        self,
+        snapshot: t.Optional[int] = None,
+        first_day: t.Optional[int] = None,
+        last_day: t.Optional[int] = None,
+        source: t.Optional[str] = None
+    ) -> pd.DataFrame:
+        '''(dimension, day) cube of a snapshot, the latest (of ``source``
+        when given) by default, restricted to the day codes from
+        ``first_day`` to ``last_day``'''
+        with self._connect() as connection:
+            if snapshot is not None:
+                row = connection.execute(
+                    'SELECT id, dimension FROM snapshots WHERE id = ?',
+                    (snapshot,)).fetchone()
+            elif source is not None:
+                row = connection.execute(
+                    'SELECT id, dimension FROM snapshots WHERE source = ? '
+                    'ORDER BY id DESC LIMIT 1', (source,)).fetchone()
+            else:
+                row = connection.execute(
+                    'SELECT id, dimension FROM snapshots '
+                    'ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                raise LookupError(
+                    f'The store has no snapshot {snapshot}'
+                    if snapshot is not None else
+                    f'The store has no snapshots of {source!r} yet'
+                    if source is not None else
+                    'The store has no snapshots yet')
+            snapshot, dimension = row
+            query, parameters = (
+                'SELECT * FROM aggregates WHERE snapshot = ?', [snapshot])
+            if first_day is not None:
+                query += ' AND day >= ?'
+                parameters.append(first_day)
+            if last_day is not None:
+                query += ' AND day <= ?'
+                parameters.append(last_day)
+            rows = pd.read_sql_query(query, connection, params=parameters)
+        rows = rows.drop(columns='snapshot').rename(
+            columns={'key': dimension, 'day': 'Day'})
+        return rows.set_index([dimension, 'Day'])[MEASURES]
+
+    def table(
+        self,
+        metric: t.Union[Metric, str],
+        dimension: t.Optional[str] = None,
+        period: str = PERIOD,
+        start: t.Optional[str] = None,
+        end: t.Optional[str] = None,
+        snapshot: t.Optional[int] = None,
+        totals: bool = False,
+        policy: DivisionPolicy = DIVISION,
+        source: t.Optional[str] = None
+    ) -> pd.DataFrame:
+        '''Dimension x period table of a metric in a snapshot (the latest,
+        of ``source`` when given, by default), from the ``start`` to the
+        ``end`` YYYY-MM month.
+
+        ``dimension`` is one of the report dimensions, the finest one
+        stored by default; ``totals`` adds the total row of the reports.
+        Only the days of the requested periods, from the one before
+        ``start`` the changes are computed from to the one holding the
+        end of ``end``, are read.
+        '''
+        # reports imports this module to append the cube of every run
+        from reports import DIMENSIONS
+
+        if isinstance(metric, str):
+            metric = find_metric(metric, period)
+        first_day = (None if start is None else
+                     _day((pd.Period(start, period) - 1).start_time))
+        # The bucket holding the end of the month is read whole, so its
+        # total is not cut at the month end
+        last_day = (None if end is None else _day(pd.Period(
+            pd.Period(end, 'M').end_time, period).end_time.normalize()))
+        cube = rebucket(
+            self.cube(snapshot, first_day, last_day, source), period)
+        if dimension is not None and dimension != cube.index.names[0]:
+            cube = rollup(cube, DIMENSIONS[dimension], dimension)
+        if totals:
+            cube = with_totals(cube)
+        table = metric.table(cube, policy).to_dense()
+        table.index = table.index.astype(str)
+        table.columns = table.columns.astype(str)
+        if start is not None:
+            first = period_labels(
+                pd.Index([_day(pd.Timestamp(start))]), period)[0]
+            table = table.loc[:, table.columns >= first]
+        return table
+
+    def restated(
+        self,
+        metric: t.Union[Metric, str],
+        dimension: t.Optional[str] = None,
+        before: t.Optional[int] = None,
+        after: t.Optional[int] = None,
+        period: str = PERIOD,
+        start: t.Optional[str] = None,
+        end: t.Optional[str] = None,
+        policy: DivisionPolicy = DIVISION,
+        source: t.Optional[str] = None
+    ) -> pd.DataFrame:
+        '''Cells of a metric table whose value differs between snapshot
+        ``before`` and ``after``, as rows of (dimension, period, before,
+        after, change); cells only one of them has count as restated.
+
+        ``after`` is the latest snapshot (of ``source`` when given) by
+        default and ``before`` the one preceding it among the snapshots
+        of the same source and dimension; snapshots of different sources
+        or dimensions are not compared.
+        '''
+        snapshots = self.snapshots(source)
+        if not len(snapshots):
+            raise LookupError(
+                'The store has no snapshots yet' if source is None
+                else f'The store has no snapshots of {source!r} yet')
+        after = snapshots.index[-1] if after is None else after
+        snapshots = self.snapshots()
+        if after not in snapshots.index:
+            raise LookupError(f'The store has no snapshot {after}')
+        series = snapshots[
+            (snapshots['source'] == snapshots.at[after, 'source'])
+            & (snapshots['dimension'] == snapshots.at[after, 'dimension'])]
+        if before is None:
+            earlier = series.index[series.index < after]
+            if not len(earlier):
+                raise LookupError(
+                    f'No snapshot of the same source precedes snapshot '
+                    f'{after}')
+            before = earlier[-1]
+        elif before not in series.index:
+            raise LookupError(
+                f'Snapshot {before} is not of the source and dimension '
+                f'of snapshot {after}')
+        old, new = (
+            self.table(metric, dimension, period, start, end, int(snapshot),
+                       policy=policy)
+            for snapshot in (before, after))
+        old, new = old.align(new)
+        old_values, new_values = old.to_numpy(), new.to_numpy()
+        restated = ~((old_values == new_values)
+                     | (np.isnan(old_values) & np.isnan(new_values)))
+        rows, columns = np.nonzero(restated)
+        before_values = old_values[rows, columns]
+        after_values = new_values[rows, columns]
+        with np.errstate(invalid='ignore'):
+            change = after_values - before_values
+        return pd.DataFrame({
+            old.index.name or 'Dimension': old.index[rows],
+            'Period': old.columns[columns],
+            'before': before_values,
+            'after': after_values,
+            'change': change,
+        })
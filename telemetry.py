@@ -0,0 +1,170 @@
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import typing as t
+
+from constants import PROFILE_DIR, PROFILER
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# (name, sorted label pairs) of a counter
+CounterKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def _max_rss_bytes() -> int:
+    '''Peak resident set size of the process (0 where it is unknown)'''
+    if resource is None:
+        return 0
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Telemetry:
+    '''Timers of the stages of a run and counters of the Sheets traffic.
+
+    A stage records its wall time and how much it raised the peak
+    resident memory of the process; stages may be nested, the time of an
+    inner stage is then part of the outer one too. Stages opened with
+    ``profile=True`` are also run under ``profiler`` ('cprofile' or
+    'pyinstrument') and their profiles written to ``profile_dir``, one
+    file per call of the stage: ``<stage>-<call>.prof`` (or ``.html``).
+    '''
+
+    def __init__(
+        self,
+        profiler: t.Optional[str] = None,
+        profile_dir: str = PROFILE_DIR
+    ):
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: dict[str, dict[str, float]] = {}
+            self.counters: dict[CounterKey, float] = {}
+            self._profiled_calls: dict[str, int] = {}
+            self.started = time.time()
+
+    def count(self, name: str, amount: float = 1, **labels: str) -> None:
+        '''Add ``amount`` to a counter, e.g. count('sheets_requests',
+        method='get_values')'''
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def stage(self, name: str, profile: bool = False) -> t.Iterator[None]:
+        '''Time the enclosed block as one pipeline stage'''
+        rss = _max_rss_bytes()
+        started = time.perf_counter()
+        with self._profiled(name, profile):
+            try:
+                yield
+            finally:
+                seconds = time.perf_counter() - started
+                with self._lock:
+                    stage = self.stages.setdefault(
+                        name, {'seconds': 0.0, 'calls': 0,
+                               'max_rss_growth_bytes': 0})
+                    stage['seconds'] += seconds
+                    stage['calls'] += 1
+                    stage['max_rss_growth_bytes'] += _max_rss_bytes() - rss
+
+    @contextlib.contextmanager
+    def _profiled(self, name: str, profile: bool) -> t.Iterator[None]:
+        if not profile or self.profiler is None:
+            yield
+            return
+        with self._lock:
+            call = self._profiled_calls.get(name, 0) + 1
+            self._profiled_calls[name] = call
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # Stages run several times per run, every call keeps its profile
+        path = os.path.join(self.profile_dir, f'{name}-{call}')
+        if self.profiler == 'pyinstrument':
+            import pyinstrument
+
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(f'{path}.html', 'w') as file:
+                    file.write(profiler.output_html())
+        elif self.profiler == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(f'{path}.prof')
+        else:
+            raise ValueError(f'Unknown profiler {self.profiler!r}')
+
+    def summary(self) -> dict[str, t.Any]:
+        with self._lock:
+            counters: dict[str, t.Any] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                if labels:
+                    label = ','.join(f'{key}={value_}'
+                                     for key, value_ in labels)
+                    counters.setdefault(name, {})[label] = value
+                else:
+                    counters[name] = value
+            return {'started': self.started,
+                    'stages': {name: dict(stage)
+                               for name, stage in self.stages.items()},
+                    'counters': counters}
+
+    def to_openmetrics(self, prefix: str = 'reports') -> str:
+        '''Stages and counters in the OpenMetrics text format'''
+        lines = []
+        with self._lock:
+            stages = {name: dict(stage)
+                      for name, stage in self.stages.items()}
+            counters = sorted(self.counters.items())
+        for metric, field, unit in [
+                ('stage_seconds', 'seconds', 'seconds'),
+                ('stage_max_rss_growth_bytes', 'max_rss_growth_bytes',
+                 'bytes')]:
+            lines.append(f'# TYPE {prefix}_{metric} gauge')
+            lines.append(f'# UNIT {prefix}_{metric} {unit}')
+            lines.extend(f'{prefix}_{metric}{{stage="{name}"}} '
+                         f'{stage[field]}'
+                         for name, stage in stages.items())
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f'# TYPE {prefix}_{name} counter')
+                declared.add(name)
+            label = ','.join(f'{key}="{value_}"' for key, value_ in labels)
+            lines.append(f'{prefix}_{name}_total'
+                         f'{"{" + label + "}" if label else ""} {value}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        '''Write the summary, as OpenMetrics for a .prom or .txt path and
+        as JSON otherwise'''
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            if path.endswith(('.prom', '.txt')):
+                file.write(self.to_openmetrics())
+            else:
+                json.dump(self.summary(), file, indent=2)
+
+
+# Telemetry of the current run, shared by the pipeline and GSheet
+TELEMETRY = Telemetry(PROFILER, PROFILE_DIR)
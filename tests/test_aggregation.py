@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import (MEASURES, OTHER, SUBTOTAL, TOTAL, DivisionPolicy,
+                         change_pivot, ratio_pivot, top_labels, with_totals)
+
+POLICIES = [DivisionPolicy(), DivisionPolicy(0, -1)]
+
+
+def random_cube(seed: int) -> pd.DataFrame:
+    '''Small (dimension, period) cube with random missing cells and zero
+    sums, so every kind of x/0 and 0/0 occurs'''
+    rng = np.random.default_rng(seed)
+    rows, columns = rng.integers(1, 7, size=2)
+    cells = [(f'row {row}', f'2023-{column + 1:02d}')
+             for row in range(rows) for column in range(columns)
+             if rng.random() < 0.5]
+    if not cells:
+        cells = [('row 0', '2023-01')]
+    index = pd.MultiIndex.from_tuples(cells, names=['Country', 'Period'])
+    values = rng.integers(0, 3, size=(len(cells), len(MEASURES)))
+    return pd.DataFrame(values.astype(float), index=index, columns=MEASURES)
+
+
+def dense(cube: pd.DataFrame, measure: str) -> pd.DataFrame:
+    '''Every (dimension, period) cell of a measure, missing ones as 0'''
+    return cube[measure].unstack(fill_value=0.0)
+
+
+def divide(
+    numerators: np.ndarray,
+    denominators: np.ndarray,
+    policy: DivisionPolicy
+) -> np.ndarray:
+    '''Cell by cell division by the rules of the policy'''
+    zero_division = policy.zero_division
+    undefined = np.nan if policy.undefined is None else policy.undefined
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.select(
+            [denominators != 0, numerators != 0],
+            [numerators / denominators,
+             numerators / 0.0 if zero_division is None
+             else np.full(numerators.shape, float(zero_division))],
+            undefined)
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+@pytest.mark.parametrize('seed', range(200))
+def test_change_pivot_matches_dense(seed, policy):
+    cube = random_cube(seed)
+    grid = dense(cube, 'Purchases')
+    values = grid.to_numpy()
+    expected = divide(values[:, 1:] - values[:, :-1], values[:, :-1],
+                      policy)
+    table = change_pivot(cube, 'Purchases', policy).to_dense()
+    assert list(table.index) == list(grid.index)
+    assert list(table.columns) == list(grid.columns[1:])
+    np.testing.assert_array_equal(table.to_numpy(), expected)
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+@pytest.mark.parametrize('seed', range(200))
+def test_ratio_pivot_matches_dense(seed, policy):
+    cube = random_cube(seed)
+    numerators = dense(cube, 'Amount spent (EUR)')
+    denominators = dense(cube, 'Purchases')
+    expected = divide(numerators.to_numpy() * 100,
+                      denominators.to_numpy(), policy)
+    table = ratio_pivot(cube, 'Amount spent (EUR)', 'Purchases', policy,
+                        scale=100).to_dense()
+    assert list(table.index) == list(numerators.index)
+    assert list(table.columns) == list(numerators.columns)
+    np.testing.assert_array_equal(table.to_numpy(), expected)
+
+
+def test_with_totals_orders_top_rows_subtotals_other_and_total():
+    spent = {'B, w': 7.0, 'A, y': 1.0, 'B, z': 5.0, 'A, x': 10.0}
+    index = pd.MultiIndex.from_tuples(
+        [(name, period) for name in spent for period in ('2023-01',
+                                                         '2023-02')],
+        names=['Campaign name', 'Period'])
+    cube = pd.DataFrame(0.0, index=index, columns=MEASURES)
+    cube['Amount spent (EUR)'] = [spent[name] for name, _ in index]
+
+    keep = top_labels(cube, 2, 'Amount spent (EUR)')
+    table = with_totals(cube, lambda names: names.str.split(',').str[0],
+                        keep)
+
+    rows = table.index.get_level_values(0)
+    assert list(rows.categories) == [
+        'A, x', SUBTOTAL.format('A'), 'B, w', SUBTOTAL.format('B'),
+        OTHER, TOTAL]
+    sums = (table['Amount spent (EUR)']
+            .groupby(level=0, observed=True).sum() / 2)
+    assert sums.to_dict() == {
+        'A, x': 10.0, SUBTOTAL.format('A'): 11.0, 'B, w': 7.0,
+        SUBTOTAL.format('B'): 12.0, OTHER: 6.0, TOTAL: 23.0}
@@ -0,0 +1,110 @@
+'''Long-running watch mode of the reports.
+
+Instead of rebuilding the reports on a schedule, a Watcher polls the
+revision of the source (the Drive ``modifiedTime`` of the spreadsheet,
+one cheap request) and runs the pipeline only once the source changed
+and then stayed unchanged for a while:
+
+    python cli.py all --watch --interval 60 --debounce 30
+
+The Sheets session and the aggregates of the previous run stay in
+memory between refreshes; clock and sleep can be replaced, so a watcher
+runs against a local or in-memory backend without waiting.
+'''
+import logging
+import time
+import typing as t
+
+from backends import Sink, Source
+from constants import (PERIOD, TELEMETRY_FILE, WATCH_DEBOUNCE_SECONDS,
+                       WATCH_INTERVAL_SECONDS)
+from incremental import Snapshot
+from reports import Report, update_reports
+from telemetry import TELEMETRY
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    '''Publishes the reports whenever the source revision changes.
+
+    A new revision is published once no other one was seen for
+    ``debounce`` seconds, so a burst of edits leads to one refresh; the
+    first poll publishes at once. A refresh that fails is tried again at
+    the next poll. Reports written to the source spreadsheet itself change
+    its revision, which triggers one more refresh that writes nothing.
+    '''
+
+    def __init__(
+        self,
+        reports: list[Report],
+        source: Source,
+        sink: Sink,
+        months: t.Optional[list[str]] = None,
+        period: str = PERIOD,
+        interval: float = WATCH_INTERVAL_SECONDS,
+        debounce: float = WATCH_DEBOUNCE_SECONDS,
+        clock: t.Callable[[], float] = time.monotonic,
+        sleep: t.Callable[[float], None] = time.sleep
+    ):
+        self.reports = reports
+        self.source = source
+        self.sink = sink
+        self.months = months
+        self.period = period
+        self.interval = interval
+        self.debounce = debounce
+        self.clock = clock
+        self.sleep = sleep
+        # Day hashes and cube of the last refresh, kept in memory
+        self.snapshot = Snapshot()
+        # Revision the published reports were built from, and the newest
+        # revision seen since with the time it was first seen
+        self.revision: t.Optional[str] = None
+        self._pending: t.Optional[tuple[str, float]] = None
+
+    def poll(self) -> bool:
+        '''Check the source revision once and refresh the reports when it
+        is due; returns whether they were refreshed'''
+        revision = self.source.get_revision()
+        if revision == self.revision:
+            self._pending = None
+            return False
+        now = self.clock()
+        if self._pending is None or self._pending[0] != revision:
+            # A new edit restarts the quiet period
+            self._pending = (revision, now)
+        if (self.revision is not None
+                and now - self._pending[1] < self.debounce):
+            return False
+        self.refresh(revision)
+        return True
+
+    def refresh(self, revision: str) -> None:
+        '''Fetch the dataset and publish every report'''
+        TELEMETRY.reset()
+        update_reports(self.reports, self.source, self.sink, self.snapshot,
+                       self.months, self.period, refresh=True)
+        TELEMETRY.write(TELEMETRY_FILE)
+        self._pending = None
+        # The revision seen before the fetch: any later one, edits made
+        # meanwhile or our own writes to the source spreadsheet, refreshes
+        # again. Writing back costs one more fetch but no writes, as the
+        # unchanged tables queue nothing.
+        self.revision = revision
+        logger.info('published %s revision %s',
+                    self.source.name, revision)
+
+    def run(self, refreshes: t.Optional[int] = None) -> int:
+        '''Poll every ``interval`` seconds, until interrupted or after
+        ``refreshes`` refreshes; returns the number of refreshes'''
+        done = 0
+        while refreshes is None or done < refreshes:
+            try:
+                done += self.poll()
+            except Exception:
+                logger.exception('refresh of %s failed', self.source.name)
+            if refreshes is not None and done >= refreshes:
+                break
+            self.sleep(self.interval)
+        return done